@@ -9,8 +9,13 @@ from data_utilities import dataframe_functions as dff
 from plotly_charts import plot_functions as plf
 from echarts import echarts as ec
 from database_processor import database_processor as dbp
+from elvr_pipeline_utilities import dataframe_functions as edff
 
 class dashboard_kit:
+
+    # Timeline rows loaded for the charts, about their width in pixels: longer simulations are loaded at a coarser timeline level
+    chart_points = 2000
+
     @staticmethod
 
     # ---------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -54,7 +59,8 @@ class dashboard_kit:
             data_collections = dbp.load_scenarios_multiple(
                 metadata_table = metadata_table,
                 database_dir = st.session_state["Temporary Filing Directory"],
-                scope = ["timeline", "passenger"]
+                scope = ["timeline", "passenger"],
+                max_points = dashboard_kit.chart_points,
             )
             color_dict = {
                 scenario: theme_colors[i] for i, scenario in enumerate(data_collections.keys())
@@ -238,7 +244,7 @@ class dashboard_kit:
         timestamps = []
         series_joint = pd.concat([df["time"] for key, df in timeline_dataframes.items()]) 
         time_range = [series_joint.min(), series_joint.max()]
-        for t in range (time_range[0], time_range[1]):
+        for t in range (time_range[0], time_range[1], edff.get_timeline_step(series_joint)):
             timestamps.append(timedelta(seconds = int(round(t, 0))))
         # ---- Get Peak Times ----
         peak_times = []
@@ -9,6 +9,7 @@ from data_utilities import dataframe_functions as dff
 from plotly_charts import plot_functions as plf
 from echarts import echarts as ec
 from database_processor import database_processor as dbp
+from elvr_pipeline_utilities import dataframe_functions as edff
 
 class dashboard_kit:
     @staticmethod
@@ -98,7 +99,7 @@ class dashboard_kit:
                         )
                 lobby_grade_caption.caption(lobby_evaluation, unsafe_allow_html=True)                    
     
-    def render_queue_length_panel(scenario_data:dict, lobby_selected:str, run_selected:str, scenario_timestamps:dict, color_dict:dict, metadata_table:pd.DataFrame) -> None:
+    def render_queue_length_panel(scenario_data:dict, lobby_selected:str, run_selected:str, scenario_timestamps:dict, color_dict:dict) -> None:
         # ---- Render Char Layout ----
         h_col1, h_col2 = st.columns([1, 25], gap = "small", vertical_alignment = "top", border = False)
         setting_panel = h_col1.popover(label=str(""), icon = ":material/search_activity:", use_container_width =False)
@@ -133,7 +134,7 @@ class dashboard_kit:
             enable_click = False
         title.markdown(f"##### Passenger Queue Length")
         with chart: 
-            timestamp = ec.render_queue_length_chart_v2(scenario_data, color_dict, metadata_table, run_selected, lobby_selected, y_ref, x_ref, enable_click, chart_height, 40, 30, key=f"ql_chart_{lobby_selected}")
+            timestamp = ec.render_queue_length_chart_v2(scenario_data, color_dict, run_selected, lobby_selected, y_ref, x_ref, enable_click, chart_height, 40, 30, key=f"ql_chart_{lobby_selected}")
             
         return {"timestamp": timestamp}
 
@@ -183,7 +184,7 @@ class dashboard_kit:
         # ---- Construct Time Controls ----
         timestamps = []
         time_series_joint = pd.concat([df["time"] for df in timeline_dataframes.values()])
-        for t in range (time_series_joint.min(), time_series_joint.max()): 
+        for t in range (time_series_joint.min(), time_series_joint.max(), edff.get_timeline_step(time_series_joint)): 
             timestamps.append(timedelta(seconds = int(round(t, 0))))
         peak_times = {
             name: int(df.loc[df['queue_length'].idxmax(), 'time']) # Make sure to pass as int or it's not JSON serializable
@@ -253,7 +254,7 @@ class dashboard_kit:
         
         if "Passenger Queue Length" in scope_containers.keys():
             with scope_containers["Passenger Queue Length"]:
-                click_timestamp_hhmmss = dashboard_kit.render_queue_length_panel(scenario_data, lobby_selected, run_selected, scenario_timestamps, color_dict, metadata_table)["timestamp"]
+                click_timestamp_hhmmss = dashboard_kit.render_queue_length_panel(scenario_data, lobby_selected, run_selected, scenario_timestamps, color_dict)["timestamp"]
                 click_timestamp = gu.hhmmss_to_seconds(click_timestamp_hhmmss) if click_timestamp_hhmmss is not None else None
                 if list(scope_containers.keys()).index("Passenger Queue Length")+1 != len(scope_containers.keys()): st.divider()
         if "Average Wait Time" in scope_containers.keys():
@@ -88,15 +88,16 @@ class database_processor:
                         max_travel_time_list.append(metadata_cache["max_travel_time"])
                 
                 # ---- Sample Data for Charts ----
-                df_timeline = pd.read_feather(os.path.join(scenario_dir, "compiled", "timeline_logbook.feather"))
+                # 60s level: peak queue length and passenger-weighted mean times per minute
+                df_timeline = edff.read_timeline_level(os.path.join(scenario_dir, "compiled", "timeline_logbook.feather"), 60, columns=["queue_length", "mean_wait_time", "mean_transit_time", "mean_travel_time"])
                 ql_charted = df_timeline['queue_length'].tolist() # or queue_length_mean, queue_length does not exist in compiled dataframe
                 wt_charted = df_timeline['mean_wait_time'].tolist()
                 transit_charted = df_timeline['mean_transit_time'].tolist()
                 travel_charted = df_timeline['mean_travel_time'].tolist()
-                ql_chart_list.append(ql_charted[::60])
-                wt_chart_list.append(wt_charted[::60])
-                transit_chart_list.append(transit_charted[::60])
-                travel_chart_list.append(travel_charted[::60])
+                ql_chart_list.append(ql_charted)
+                wt_chart_list.append(wt_charted)
+                transit_chart_list.append(transit_charted)
+                travel_chart_list.append(travel_charted)
         
         df_summary = pd.DataFrame()
         df_summary["Date"] = date_list
@@ -151,9 +152,20 @@ class database_processor:
         return df_snapshot
 
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # ---- Timeline Level for Charts ----
+    def get_timeline_interval(scenario_dirs:list[str], max_points:int = None) -> int:
+        '''
+        One timeline level for the given scenarios: the coarsest still giving `max_points` rows over their joint time span (1 without max_points)
+        '''
+        if not max_points or not scenario_dirs: return 1
+        time_column = pd.concat([edff.read_timeline(os.path.join(scenario_dir, "compiled", "timeline_logbook.feather"), columns = ["time"])["time"] for scenario_dir in scenario_dirs])
+        return edff.select_timeline_level(time_column.max() - time_column.min() if len(time_column) else 0, max_points)
+
     # ---- Load Dataframes to Memory ----
-    def load_scenario_dataframes(scenario_id:str, file_name:str, database_dir:str, scope:list[str] = ["lift", "passenger", "timeline"]) -> dict:
+    def load_scenario_dataframes(scenario_id:str, file_name:str, database_dir:str, scope:list[str] = ["lift", "passenger", "timeline"], max_points:int = None, interval:int = None) -> dict:
         scenario_dir = os.path.join(database_dir, file_name, scenario_id)
+        # with max_points (e.g. chart width in pixels) every timeline of the scenario is loaded at the same level, levels carry no registers
+        if interval is None: interval = database_processor.get_timeline_interval([scenario_dir], max_points)
         run_list = [item for item in os.listdir(scenario_dir) if os.path.isdir(os.path.join(scenario_dir, item))]
         df_collection = {}
         # ---- Fetch Run Data ----
@@ -162,18 +174,19 @@ class database_processor:
             run_dir = os.path.join(scenario_dir, run_id)
             feather_list = [file for file in os.listdir(run_dir) if file.endswith('.feather')]
             run_dict = {}
-            lift_dict = {}
             passenger_dict = {}
             timeline_dict = {}
             for feather_name in feather_list:
                 feather_path = os.path.join(run_dir, feather_name)
                 
-                if feather_name.startswith("lift") and "lift" in scope: 
-                    df_lift = pd.read_feather(feather_path)
-                    run_dict["lift"] = df_lift
-                    for lift_id, df_lift_split in df_lift.groupby("lift_id"):
-                        lift_dict[str(lift_id)] = df_lift_split
-                    run_dict["lift_perlift"] = lift_dict
+                if feather_name == "lift_logbook.feather" and "lift" in scope: 
+                    run_dict["lift"] = pd.read_feather(feather_path)
+
+                elif feather_name == "lift_trips.feather" and "lift" in scope:
+                    run_dict["lift_trips"] = pd.read_feather(feather_path)
+
+                elif feather_name == "lift_occupancy.feather" and "lift" in scope:
+                    run_dict["lift_occupancy"] = pd.read_feather(feather_path)
                     
                 elif feather_name.startswith("passenger") and "passenger" in scope:
                     df_passenger = pd.read_feather(feather_path)
@@ -181,27 +194,33 @@ class database_processor:
                     for lobby_id, df_passenger_split in df_passenger.groupby("lobby_id"):
                         passenger_dict[str(lobby_id)] = df_passenger_split
                     run_dict["passenger_perlobby"] = passenger_dict
+
+                elif feather_name in ["od_matrix.feather", "od_timeline.feather"] and "passenger" in scope:
+                    run_dict[feather_name.replace(".feather", "")] = pd.read_feather(feather_path)
                     
                 elif feather_name.startswith("timeline") and "timeline" in scope:
                     # ---- Set Scope ----
-                    col_names = pd.read_feather(feather_path, columns=[]).columns.tolist()
+                    col_names = edff.get_timeline_columns(feather_path)
                     col_scope = [col for col in col_names if 
                                  not col.endswith("_register") or 
-                                 col in ["wait_time_register", "mean_wait_time_register"]]
-                    # wait_time_register takes a long time to load but necessary for queue length threshold graph
+                                 col in ["mean_wait_time_register"]]
+                    # queue length threshold graph reads threshold columns or wait_time_histogram, only timelines ingested before those need wait_time_register
+                    if "wait_time_histogram" not in col_names and not any(col.startswith("threshold_") for col in col_names): col_scope.append("wait_time_register")
                     # -- Load Dataframe ----
                     if feather_name == "timeline_logbook.feather":
-                        run_dict["timeline"] = pd.read_feather(feather_path, columns = col_scope)#
+                        run_dict["timeline"] = edff.read_timeline_level(feather_path, interval, columns = col_scope)#
                     else:
                         lobby_id = feather_name.split("_")[-1].replace(".feather", "").strip()
-                        timeline_dict[lobby_id] = pd.read_feather(feather_path, columns = col_scope)#
+                        timeline_dict[lobby_id] = edff.read_timeline_level(feather_path, interval, columns = col_scope)#
                         
             run_dict["timeline_perlobby"] = timeline_dict
             df_collection[str(run_id).strip()] = run_dict
 
         return df_collection
     
-    def load_scenarios_multiple(metadata_table:pd.DataFrame, database_dir:str, scope:list[str] = ["lift", "passenger", "timeline"]) -> dict:
+    def load_scenarios_multiple(metadata_table:pd.DataFrame, database_dir:str, scope:list[str] = ["lift", "passenger", "timeline"], max_points:int = None) -> dict:
+        # ---- Set Level shared by all Scenarios, so their Charts share a Time Axis ----
+        interval = database_processor.get_timeline_interval([os.path.join(database_dir, row["File"], row["ID"]) for idx, row in metadata_table.iterrows()], max_points)
         # ---- Load Dataframes ----
         df_collections = {}
         theme_colors = ['rgb(51, 204, 255)', 'rgb(204, 51, 0)', 'rgb(204, 153, 255)', 'rgb(255, 102, 204)']
@@ -211,7 +230,7 @@ class database_processor:
             file_name = row["File"]
             scenario_id = row["ID"]
             # ---- Load Dataframes ----
-            df_collection = database_processor.load_scenario_dataframes(scenario_id, file_name, database_dir, scope)
+            df_collection = database_processor.load_scenario_dataframes(scenario_id, file_name, database_dir, scope, interval = interval)
             df_collections[scenario] = {
                 "data": df_collection,
                 "color": theme_colors[i],
@@ -386,7 +405,7 @@ class database_processor:
 
     def load_lift_selection(df_collection:dict, widget_key:str = "lift_selectior") -> str:
         lift_list = []
-        for lift_id in df_collection['1']['lift_perlift'].keys():
+        for lift_id in df_collection['1']['lift']["lift_id"].unique():
             if lift_id not in lift_list:
                 lift_list.append(lift_id)
     
@@ -460,8 +479,15 @@ class database_processor:
                 with tab_lift:
                     run_selection = database_processor.load_run_selection(df_collection, multiple=False, skip_compiled = True, widget_key=f"run_selection_lift_{file_name.strip()}_{scenario_id}")
                     lift_selection = database_processor.load_lift_selection(df_collection, widget_key=f"lift_selection_{file_name.strip()}_{scenario_id}")
-                    if lift_selection == "all": df_display = df_collection[str(run_selection)]["lift"]
-                    else: df_display = df_collection[str(run_selection)]["lift_perlift"][str(lift_selection)]
-                    if run_selection is not None: st.dataframe(df_display, height=800)
+                    df_display = df_collection[str(run_selection)]["lift"]
+                    df_trips = df_collection[str(run_selection)].get("lift_trips")
+                    if lift_selection != "all": 
+                        df_display = df_display[df_display["lift_id"] == int(lift_selection)]
+                        if df_trips is not None: df_trips = df_trips[df_trips["lift_id"] == int(lift_selection)]
+                    if run_selection is not None: 
+                        st.dataframe(df_display, height=800)
+                        if df_trips is not None:
+                            st.write(f"###### Lift Trips ({len(df_trips)})")
+                            st.dataframe(df_trips, height=400)
 
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
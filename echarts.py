@@ -9,6 +9,7 @@ from streamlit_echarts import st_echarts
 from data_utilities import dataframe_functions as dff
 from general_utilities import general_utilities as gu
 from database_processor import database_processor as dbp
+from elvr_pipeline_utilities import dataframe_functions as edff
 
 
 class echarts:
@@ -20,9 +21,8 @@ class echarts:
         # ---- Unpack Scenario Data ----
         data_collections = scenario_data["data_collections"]
         color_dict = scenario_data["color_dict"]
-        metadata_table = scenario_data["metadata_table"]
         display_threshold = True if len(data_collections.keys()) < 2 else False
-        thresholds = [60, 120, 180, 240]
+        thresholds = edff.wait_thresholds
         # ---- Sort Data ----
         data_dict = dbp.sort_data_collections(data_collections)
         # data_dict = dbp.order_data_collections(data_dict)
@@ -83,19 +83,43 @@ class echarts:
             ]
             series.extend(ql_series)
             z_height += 1
-            # ---- Fetch Threshold Data ----
-            dataframe_updated = False
+            # ---- Add Run Band Series (queue length percentiles across runs, compiled timelines only) ----
+            band_low, band_high = f"queue_length_band_p{min(edff.timeline_band_percentiles)}", f"queue_length_band_p{max(edff.timeline_band_percentiles)}"
+            if run_selected == "compiled" and band_low in df_timeline.columns and band_high in df_timeline.columns:
+                band_series = [
+                    {
+                    "name": "Run Band",
+                    "data": round(df_timeline[band_low], 1).tolist(),
+                    "type": "line",
+                    "stack": f"run_band_{i}",
+                    "symbol": "none",
+                    "lineStyle": {"color": color, "width": 0.5, "type": "dashed"},
+                    "areaStyle": {"color": "transparent"},
+                    "emphasis": {"disabled": True, "focus": "none"},
+                    "tooltip": {"show": False},
+                    "z": z_height + len(thresholds),
+                    },
+                    {
+                    "name": "Run Band",
+                    "data": round(df_timeline[band_high] - df_timeline[band_low], 1).tolist(),
+                    "type": "line",
+                    "stack": f"run_band_{i}",
+                    "symbol": "none",
+                    "lineStyle": {"color": color, "width": 0.5, "type": "dashed"},
+                    "areaStyle": {"color": color, "opacity": 0.15},
+                    "emphasis": {"disabled": True, "focus": "none"},
+                    "tooltip": {"show": False},
+                    "z": z_height + len(thresholds),
+                    },
+                ]
+                series.extend(band_series)
+            # ---- Fetch Threshold Data (written at ingest, only derived in memory for data ingested before) ----
+            if any(f"threshold_{threshold}" not in df_timeline.columns for threshold in thresholds):
+                queue_length = ql_data.to_numpy() if run_selected == "compiled" or lobby_selected == "all" else None
+                if "wait_time_histogram" in df_timeline.columns: threshold_columns = edff.get_histogram_thresholds(df_timeline['wait_time_histogram'], queue_length, thresholds)
+                else: threshold_columns = edff.get_threshold_columns(*edff.get_register_csr(df_timeline['wait_time_register']), queue_length, thresholds)
+                df_timeline = df_timeline.assign(**threshold_columns)
             for k, threshold in enumerate(thresholds):
-                # ---- Check for Threshold Data ----
-                if f"threshold_{threshold}" not in list(df_timeline.columns):
-                    if run_selected == "compiled" or lobby_selected == "all":
-                        fraction_data = df_timeline['wait_time_register'].apply(lambda lst: sum(x > threshold for x in lst)/len(lst) if len(lst) > 0 else 0)
-                        theshold_data = round(ql_data * fraction_data, 1)
-                    else:
-                        theshold_data = df_timeline['wait_time_register'].apply(lambda lst: sum(x > threshold for x in lst) if len(lst) > 0 else 0)
-                    df_timeline[f"threshold_{threshold}"] = theshold_data
-                    dataframe_updated = True
-                    print( f"threshold data updated for {scenario}: {threshold} s")
                 theshold_data = df_timeline[f"threshold_{threshold}"]           
                 # ---- Construct Threshold Series ----     
                 area_color = gu.make_color_brighter(color, brightness - (brightness*((k+1)/len(thresholds))))
@@ -125,18 +149,7 @@ class echarts:
                 ]
                 series.extend(fraction_series)
                 z_height += 1
-            
-            # ---- Save Threshold Data ----
-            metadata_row = metadata_table[metadata_table["Scenario"] == scenario].iloc[0]
-            file_name = metadata_row["File"]
-            sim_id = metadata_row["ID"]
-            feather_name = "timeline_logbook.feather" if lobby_selected == "all" else f"timeline_logbook_{lobby_selected}.feather"
-            if "Temporary Filing Directory" in st.session_state and dataframe_updated:
-                base_dir = st.session_state["Temporary Filing Directory"] 
-                save_dir = os.path.join(base_dir, file_name, sim_id, run_selected, feather_name)
-                df_timeline.to_feather(save_dir)
-                print(f"Updated Dataframe: {os.path.join(file_name, sim_id, run_selected, feather_name)}")
-            else: print("Dataframe remain the same")
+
 
         # ---- Get x y Range ----
         time_series_list = []
@@ -147,7 +160,7 @@ class echarts:
             y_series_list.append(ql)
         series_joint = pd.concat(time_series_list)
         time_range = [math.ceil(float(series_joint.min())), math.ceil(float(series_joint.max()))]
-        timestamps = list(range(time_range[0], time_range[1]))
+        timestamps = list(range(time_range[0], time_range[1], edff.get_timeline_step(series_joint)))
         timestamps = [gu.seconds_to_hhmmss(s) for s in timestamps]
         # ---- Get Y Range ----
         y_series_joint = pd.concat(y_series_list)
@@ -261,8 +274,12 @@ class echarts:
 
             # ---- Add Domain Series ----
             timeline_compiled = content["timeline"][lobby_selected]["compiled"]
-            domain_min_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: min(lst) if len(lst)!= 0 else 0)
-            domain_diff_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: max(lst) - min(lst) if len(lst)!= 0 else 0)
+            if "mean_wait_time_band_min" in timeline_compiled.columns:
+                domain_min_series = timeline_compiled['mean_wait_time_band_min']
+                domain_diff_series = timeline_compiled['mean_wait_time_band_max'] - domain_min_series
+            else:
+                domain_min_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: min(lst) if len(lst)!= 0 else 0)
+                domain_diff_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: max(lst) - min(lst) if len(lst)!= 0 else 0)
             opacity = 1.0 if display_threshold else 0.75
             series_dict[scenario]["domain"] = [
                 {
@@ -359,7 +376,7 @@ class echarts:
             time_series_list.append(content["timeline"][lobby_selected]["compiled"]["time"])
         series_joint = pd.concat(time_series_list)
         time_range = [math.ceil(float(series_joint.min())), math.ceil(float(series_joint.max()))]
-        timestamps = list(range(time_range[0], time_range[1]))
+        timestamps = list(range(time_range[0], time_range[1], edff.get_timeline_step(series_joint)))
         timestamps = [gu.seconds_to_hhmmss(s) for s in timestamps]
         
         # ---- Get Y Range ----
@@ -380,7 +397,7 @@ class echarts:
                 if run_id == "compiled": continue
                 wt_register.append(df_passenger["wait_time"])
                 mean_wt = df_passenger["wait_time"].mean()
-                ref_line_data = [mean_wt]*(time_range[1]-time_range[0])
+                ref_line_data = [mean_wt]*len(timestamps)
                 series_dict[scenario]["global_average"][run_id] = {
                     "name": "Global Average",
                     "type": "line",
@@ -394,7 +411,7 @@ class echarts:
                 }
             
             mean_wt = pd.concat(wt_register).mean()
-            ref_line_data = [mean_wt]*(time_range[1]-time_range[0])
+            ref_line_data = [mean_wt]*len(timestamps)
             series_dict[scenario]["global_average"]["compiled"] = {
                 "name": "Global Average",
                 "type": "line",
@@ -510,10 +527,10 @@ class echarts:
         st_echarts(options = options, width="100%", height="500px", key="wait_time_chart", renderer="svg")
     
     # ---- Render Time Chart V2 ----
-    def render_queue_length_chart_v2(scenario_data:dict, color_dict:dict, metadata_table:pd.DataFrame, run_selected, lobby_selected, y_ref = None, x_ref = None, enable_click = False, chart_height = 500, margin_side = 40, margin_top = 40, key = "ql_chart") -> None:
+    def render_queue_length_chart_v2(scenario_data:dict, color_dict:dict, run_selected, lobby_selected, y_ref = None, x_ref = None, enable_click = False, chart_height = 500, margin_side = 40, margin_top = 40, key = "ql_chart") -> None:
         # ---- Unpack Scenario Data ----
         display_threshold = True if len(scenario_data.keys()) < 2 else False
-        thresholds = [60, 120, 180, 240]
+        thresholds = edff.wait_thresholds
         # ---- Construct Series Data ----
         series = []
         z_height = 0
@@ -569,19 +586,43 @@ class echarts:
             ]
             series.extend(ql_series)
             z_height += 1
-            # ---- Fetch Threshold Data ----
-            dataframe_updated = False
+            # ---- Add Run Band Series (queue length percentiles across runs, compiled timelines only) ----
+            band_low, band_high = f"queue_length_band_p{min(edff.timeline_band_percentiles)}", f"queue_length_band_p{max(edff.timeline_band_percentiles)}"
+            if run_selected == "compiled" and band_low in df_timeline.columns and band_high in df_timeline.columns:
+                band_series = [
+                    {
+                    "name": "Run Band",
+                    "data": round(df_timeline[band_low], 1).tolist(),
+                    "type": "line",
+                    "stack": f"run_band_{i}",
+                    "symbol": "none",
+                    "lineStyle": {"color": color, "width": 0.5, "type": "dashed"},
+                    "areaStyle": {"color": "transparent"},
+                    "emphasis": {"disabled": True, "focus": "none"},
+                    "tooltip": {"show": False},
+                    "z": z_height + len(thresholds),
+                    },
+                    {
+                    "name": "Run Band",
+                    "data": round(df_timeline[band_high] - df_timeline[band_low], 1).tolist(),
+                    "type": "line",
+                    "stack": f"run_band_{i}",
+                    "symbol": "none",
+                    "lineStyle": {"color": color, "width": 0.5, "type": "dashed"},
+                    "areaStyle": {"color": color, "opacity": 0.15},
+                    "emphasis": {"disabled": True, "focus": "none"},
+                    "tooltip": {"show": False},
+                    "z": z_height + len(thresholds),
+                    },
+                ]
+                series.extend(band_series)
+            # ---- Fetch Threshold Data (written at ingest, only derived in memory for data ingested before) ----
+            if any(f"threshold_{threshold}" not in df_timeline.columns for threshold in thresholds):
+                queue_length = ql_data.to_numpy() if run_selected == "compiled" or lobby_selected == "all" else None
+                if "wait_time_histogram" in df_timeline.columns: threshold_columns = edff.get_histogram_thresholds(df_timeline['wait_time_histogram'], queue_length, thresholds)
+                else: threshold_columns = edff.get_threshold_columns(*edff.get_register_csr(df_timeline['wait_time_register']), queue_length, thresholds)
+                df_timeline = df_timeline.assign(**threshold_columns)
             for k, threshold in enumerate(thresholds):
-                # ---- Check for Threshold Data ----
-                if f"threshold_{threshold}" not in list(df_timeline.columns):
-                    if run_selected == "compiled" or lobby_selected == "all":
-                        fraction_data = df_timeline['wait_time_register'].apply(lambda lst: sum(x > threshold for x in lst)/len(lst) if len(lst) > 0 else 0)
-                        theshold_data = round(ql_data * fraction_data, 1)
-                    else:
-                        theshold_data = df_timeline['wait_time_register'].apply(lambda lst: sum(x > threshold for x in lst) if len(lst) > 0 else 0)
-                    df_timeline[f"threshold_{threshold}"] = theshold_data
-                    dataframe_updated = True
-                    print( f"threshold data updated for {scenario}: {threshold} s")
                 theshold_data = df_timeline[f"threshold_{threshold}"]           
                 # ---- Construct Threshold Series ----     
                 area_color = gu.make_color_brighter(color, brightness - (brightness*((k+1)/len(thresholds))))
@@ -611,18 +652,7 @@ class echarts:
                 ]
                 series.extend(fraction_series)
                 z_height += 1
-            
-            # ---- Save Threshold Data ----
-            metadata_row = metadata_table[metadata_table["Scenario"] == scenario].iloc[0]
-            file_name = metadata_row["File"]
-            sim_id = metadata_row["ID"]
-            feather_name = "timeline_logbook.feather" if lobby_selected == "all" else f"timeline_logbook_{lobby_selected}.feather"
-            if "Temporary Filing Directory" in st.session_state and dataframe_updated:
-                base_dir = st.session_state["Temporary Filing Directory"] 
-                save_dir = os.path.join(base_dir, file_name, sim_id, run_selected, feather_name)
-                df_timeline.to_feather(save_dir)
-                print(f"Updated Dataframe: {os.path.join(file_name, sim_id, run_selected, feather_name)}")
-            else: print("Dataframe remain the same")
+
 
         # ---- Get x y Range ----
         time_series_list = []
@@ -633,7 +663,7 @@ class echarts:
             y_series_list.append(ql)
         series_joint = pd.concat(time_series_list)
         time_range = [math.ceil(float(series_joint.min())), math.ceil(float(series_joint.max()))]
-        timestamps = list(range(time_range[0], time_range[1]))
+        timestamps = list(range(time_range[0], time_range[1], edff.get_timeline_step(series_joint)))
         timestamps = [gu.seconds_to_hhmmss(s) for s in timestamps]
         # ---- Get Y Range ----
         y_series_joint = pd.concat(y_series_list)
@@ -743,8 +773,12 @@ class echarts:
 
             # ---- Add Domain Series ----
             timeline_compiled = content["timeline"][lobby_selected]["compiled"]
-            domain_min_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: min(lst) if len(lst)!= 0 else 0)
-            domain_diff_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: max(lst) - min(lst) if len(lst)!= 0 else 0)
+            if "mean_wait_time_band_min" in timeline_compiled.columns:
+                domain_min_series = timeline_compiled['mean_wait_time_band_min']
+                domain_diff_series = timeline_compiled['mean_wait_time_band_max'] - domain_min_series
+            else:
+                domain_min_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: min(lst) if len(lst)!= 0 else 0)
+                domain_diff_series = timeline_compiled['mean_wait_time_register'].apply(lambda lst: max(lst) - min(lst) if len(lst)!= 0 else 0)
             opacity = 1.0 if display_threshold else 0.75
             series_dict[scenario]["domain"] = [
                 {
@@ -841,7 +875,7 @@ class echarts:
             time_series_list.append(content["timeline"][lobby_selected]["compiled"]["time"])
         series_joint = pd.concat(time_series_list)
         time_range = [math.ceil(float(series_joint.min())), math.ceil(float(series_joint.max()))]
-        timestamps = list(range(time_range[0], time_range[1]))
+        timestamps = list(range(time_range[0], time_range[1], edff.get_timeline_step(series_joint)))
         timestamps = [gu.seconds_to_hhmmss(s) for s in timestamps]
         
         # ---- Get Y Range ----
@@ -862,7 +896,7 @@ class echarts:
                 if run_id == "compiled": continue
                 wt_register.append(df_passenger["wait_time"])
                 mean_wt = df_passenger["wait_time"].mean()
-                ref_line_data = [mean_wt]*(time_range[1]-time_range[0])
+                ref_line_data = [mean_wt]*len(timestamps)
                 series_dict[scenario]["global_average"][run_id] = {
                     "name": "Global Average",
                     "type": "line",
@@ -876,7 +910,7 @@ class echarts:
                 }
             
             mean_wt = pd.concat(wt_register).mean()
-            ref_line_data = [mean_wt]*(time_range[1]-time_range[0])
+            ref_line_data = [mean_wt]*len(timestamps)
             series_dict[scenario]["global_average"]["compiled"] = {
                 "name": "Global Average",
                 "type": "line",
@@ -1,95 +1,362 @@
 import os
 import io
 import math
+import hashlib
+import zipfile
+import contextlib
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 import streamlit as st
 from datetime import datetime, timedelta
-from io import StringIO
 
 class dataframe_functions:
 
+    # ---- ELVR Table Schema ----
+    # Field names and dtypes in column order. Ids are narrowed to int16/int32 and quantities to float32,
+    # absolute timestamps stay float64 as float32 cannot resolve 0.1s steps exactly at ~30,000s+
+    field_mapping = {
+        "SpatialPlot": {"lift_id": "int16", "time": "float64", "lobby_id": "int16", "load": "float32", "area": "float32"},
+        "Person": {"time_arrived": "float64", "lobby_id": "int16", "unk_index_1": "int32", "destination_id": "int16", "weight": "float32", "capacity_factor": "float32", 
+                "loading_time": "float32", "unloading_time": "float32", "tbc_time_disembarked": "float64",
+                "unk_index_2": "int32", "lift_id": "int16", "tbc_wait_time_end": "float64", "tbc_transit_time_end": "float64", 
+                "tbc_index_3": "int32", "actual_destination_id": "int16", "tbc_index_4": "int32", "tbc_index_5": "int32", "tbc_index_6": "int32", "tbc_index_7": "int32", 
+                "tbc_index_8": "int32", "tbc_index_9": "int32", "tbc_index_10": "int32", 
+                "tbc_metric_11": "float32", "tbc_metric_12": "float32", "tbc_metric_13": "float32", "tbc_index_14": "int32", "tbc_index_15": "int32"},
+        }
+    # Fields read by default, unused columns are skipped at read time
+    field_projection = {
+        "Person": ["lobby_id", "destination_id", "lift_id", "time_arrived", "tbc_wait_time_end", "tbc_transit_time_end", "tbc_time_disembarked"],
+        }
+    skip_categories = ["NoPassengers", "RemoteMonitoring"]
+    # Compressed ELVR uploads and their Arrow codec, decompressed as a stream while scanning. .zip bundles hold many .elvr files
+    compressed_formats = {".elvr.gz": "gzip", ".elvr.zst": "zstd"}
+    # Bucket width in seconds of the per-lift load/area occupancy series
+    occupancy_interval = 1
+    # Bucket width in seconds of the time-bucketed origin-destination matrices
+    od_interval = 300
+    # Coarser timeline levels (seconds per row) written next to each 1s timeline, for charts and summaries of long simulations
+    timeline_levels = [10, 60, 300]
+    # Wait times (s) counted per timeline row in threshold_{t} columns at ingest
+    wait_thresholds = [60, 120, 180, 240]
+    # Percentiles of the wait and travel time registers kept per timeline row as p{q}_wait_time / p{q}_travel_time
+    timeline_percentiles = [50, 90, 95]
+    # Percentiles of the across-run (or across-lobby) bands of queue length and mean wait in compiled timelines, as {kpi}_band_p{q}
+    timeline_band_percentiles = [10, 50, 90]
+    # Fixed-bin histograms per timeline row, {kpi: (bin width s, bins)}: bin 0 holds times of 0 s, bin k times in ((k-1) x width, k x width], the last bin every longer time.
+    # Merged by summing, they are the quantile sketch compiled timelines take percentiles and thresholds from
+    timeline_histograms = {"wait_time": (15, 61), "travel_time": (15, 81)}
+    # Seconds of timeline generated and written per record batch, a multiple of every timeline level so level rows never straddle two blocks
+    timeline_chunk_size = 3600
+    # Feather codec of timeline files. Registers compress ~30x with zstd; "uncompressed" trades disk for zero-copy memory-mapped reads
+    timeline_compression = "zstd"
+    # Bump whenever parse/index or ingest output changes, to invalidate cached upload results and re-ingest filed runs
+    parser_version = "12"
+
     @staticmethod
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
     #### 0.1 Parse ELVR File to Inital Logs
-    # ---- 0.1.1 Parse ELVR File ----
-    def parse_elvr(uploaded_file, print_log = False) -> list[dict]:
+    # ---- 0.1.0 Scan ELVR Byte Stream ----
+    def _scan_elvr(uploaded_file, chunk_size:int = 1 << 23):
+        '''
+        Read an ELVR byte stream once, chunk by chunk, and yield (category, byte offset, rows) segments.
+        Each segment is a run of consecutive lines sharing the same leading category cell within a chunk;
+        "SimulationID" header lines are always yielded on their own. Line categories are resolved with numpy
+        over the raw bytes, so only the segment boundaries are ever touched from Python.
+        '''
+        key_width = 24
+        chunk_offset = 0
+        pending = b""
+        prev_key = None
+        prev_category = None
+        while True:
+            # ---- Read Complete Lines ----
+            chunk = uploaded_file.read(chunk_size)
+            at_eof = not chunk
+            data = pending + chunk if pending else chunk
+            if at_eof:
+                if not data: break
+                if not data.endswith(b"\n"): data += b"\n"
+                pending = b""
+            else:
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    pending = data
+                    continue
+                data, pending = data[:cut], data[cut:]
 
-        # ---- Pasrse ELVR ----
-        logs = []
-        # ---- Fetch File ----
-        # uploaded_file is a file-like object (e.g. from Streamlit)
-        f = io.TextIOWrapper(uploaded_file, encoding="utf-8")
-        filename = getattr(uploaded_file, "name", "uploaded_file")
+            # ---- Locate Lines ----
+            buffer = np.frombuffer(data, dtype=np.uint8)
+            line_starts = np.concatenate(([0], np.flatnonzero(buffer == 10)[:-1] + 1))
+            # ---- Build Category Keys (leading bytes up to the first comma or line break) ----
+            padded = np.concatenate((buffer, np.zeros(key_width, dtype=np.uint8)))
+            heads = padded[line_starts[:, None] + np.arange(key_width)]
+            heads[np.cumsum((heads == 44) | (heads == 10) | (heads == 13), axis=1) > 0] = 0
+            # ---- Find Category Changes, ignoring Blank Lines ----
+            filled = np.flatnonzero(heads[:, 0] != 0)
+            keys = heads[filled]
+            is_header = np.all(keys[:, :12] == np.frombuffer(b"SimulationID", dtype=np.uint8), axis=1)
+            changes = np.ones(len(filled), dtype=bool)
+            changes[1:] = np.any(keys[1:] != keys[:-1], axis=1) | is_header[1:] | is_header[:-1]
+            if len(filled) and prev_key is not None and not is_header[0]:
+                changes[0] = bool(np.any(keys[0] != prev_key))
+            boundaries = filled[changes]
+            header_lines = set(filled[is_header].tolist())
 
-        # ---- Operate on File ----
+            # ---- Yield Segments ----
+            segment_starts = line_starts[boundaries].tolist()
+            if not segment_starts or segment_starts[0] != 0:
+                segment_starts.insert(0, 0)
+                boundaries = np.concatenate(([-1], boundaries))
+            segment_ends = segment_starts[1:] + [len(data)]
+            view = memoryview(data)
+            for line_index, start, end in zip(boundaries.tolist(), segment_starts, segment_ends):
+                if line_index >= 0 and line_index in header_lines: prev_category = "SimulationID"
+                elif line_index >= 0: prev_category = bytes(heads[line_index]).rstrip(b"\0").decode("utf-8", errors="replace")
+                if prev_category is None: continue  # leading blank lines
+                yield prev_category, chunk_offset + start, view[start:end]
+            if len(filled):
+                prev_key = None if is_header[-1] else keys[-1]
+                if is_header[-1]: prev_category = None
+            chunk_offset += len(data)
+            if at_eof: break
+
+    # ---- 0.1.0.1 Iterate ELVR Tables ----
+    def _iter_elvr_tables(uploaded_file):
+        '''
+        Group scanned segments into whole tables and yield (log, rows) per table, where log records
+        the table category, simulation ID, run and the byte offset/length of the table within the stream
+        '''
         cur_table_category = None
         cur_table = []
+        cur_offset = 0
+        cur_end = 0
         run = None
         sim_id = None
-        lift_count = None
-        field_mapping = {
-            "SpatialPlot": ["lift_id", "time", "lobby_id", "load", "area"],
-            "Person": ["time_arrived", "lobby_id", "unk_index_1", "destination_id", "weight","capacity_factor", "loading_time", "unloading_time", "tbc_time_disembarked",
-                    "unk_index_2", "lift_id", "tbc_wait_time_end", "tbc_transit_time_end", 
-                    "tbc_index_3", "actual_destination_id", "tbc_index_4", "tbc_index_5", "tbc_index_6", "tbc_index_7", "tbc_index_8", "tbc_index_9", "tbc_index_10", 
-                    "tbc_metric_11", "tbc_metric_12", "tbc_metric_13", "tbc_index_14", "tbc_index_15"],
-            }
-        time_start = datetime.now()
-        skip_categories = ["NoPassengers", "RemoteMonitoring"]
 
-        # ---- Parse through each line ----
-        for line in f: 
-            # ---- Clean and Skip blank lines ----
-            line = line.strip()
-            if not line: continue
+        # ---- Close Current Table ----
+        def close_table():
+            if cur_table_category is None or cur_table_category in dataframe_functions.skip_categories or not cur_table: return None
+            fingerprint = hashlib.blake2b(digest_size=16)
+            for rows in cur_table: fingerprint.update(rows)
+            log = {"category": cur_table_category, "simulation_id": sim_id, "run": run, "offset": cur_offset, "length": cur_end - cur_offset, "fingerprint": fingerprint.hexdigest()}
+            return log, cur_table
+
+        # ---- Parse through each segment ----
+        for entry_category, offset, rows in dataframe_functions._scan_elvr(uploaded_file):
             # ---- Get Summary Inforamtion ----
-            if line.startswith("SimulationID"):
-                cells = line.split(",")
+            if entry_category == "SimulationID":
+                table = close_table()
+                if table: yield table
+                cur_table_category, cur_table = None, []
+                cells = bytes(rows).decode("utf-8").strip().split(",")
                 sim_id = cells[0].split(": ")[1]
                 run = cells[1].strip()
-                if print_log: print("Loading Simulation ID: " + sim_id + ", Run: " + run)
-                continue
-            
-            # ---- Collect Table Information ----
-            entry_category = line.split(",")[0]
-            
-            # ---- Log First Line ----
-            if cur_table_category is None:
-                cur_table_category = entry_category
-                cur_table.append(line)
                 continue
-
             # ---- Log End of Table ----
-            if (cur_table_category != entry_category): # End of current table
-                if (cur_table_category not in skip_categories):
-                    # ---- Log and Clear Table ----
-                    if print_log: print(f"Loading Dataframe: {cur_table_category} with {len(cur_table)} entries")
-                    df_elvr = pd.read_csv(StringIO("\n".join(cur_table)), header=None, low_memory=True)
-                    df_elvr.drop(df_elvr.columns[0], axis=1, inplace=True)
-                    # ---- Apply Field Mapping ----
-                    if cur_table_category in field_mapping: df_elvr.columns = field_mapping[cur_table_category]
-                    # ---- Get Lift Count ----
-                    if cur_table_category == "SpatialPlot": lift_count = df_elvr.iloc[:, 0].nunique()
-                    logs.append({"category": cur_table_category, "dataframe": df_elvr, "simulation_id": sim_id, "run": run, "lift_count": lift_count})
-                    cur_table = []
-
-                # ---- Start New Table ----
-                cur_table_category = entry_category
-                # ---- Skip Lines based on categories ----
-                if cur_table_category in skip_categories: continue
-                cur_table.append(line)
-                continue
-            
-            # ---- Log Lines ----
-            if cur_table_category == entry_category: # Collect Rows
-                cur_table.append(line)
-                continue
-                
-        print(f"Finished Parsing {filename} \nEntries Logged: {len(logs)} \nProcessing Time: {(datetime.now() - time_start).total_seconds()}s")
+            if cur_table_category != entry_category:
+                table = close_table()
+                if table: yield table
+                cur_table_category, cur_table, cur_offset = entry_category, [], offset
+            # ---- Collect Rows ----
+            if cur_table_category not in dataframe_functions.skip_categories: cur_table.append(rows)
+            cur_end = offset + len(rows)
+        table = close_table()
+        if table: yield table
+
+    # ---- 0.1.0.2 Open ELVR Upload ----
+    def get_elvr_name(filename:str) -> str:
+        name = os.path.basename(filename)
+        for extension in [".zip", *dataframe_functions.compressed_formats, ".elvr"]:
+            if name.lower().endswith(extension): return name[:-len(extension)]
+        return os.path.splitext(name)[0]
+
+    def is_compressed_elvr(filename:str) -> bool:
+        return filename.lower().endswith((".zip", *dataframe_functions.compressed_formats))
+
+    def list_elvr_members(uploaded_file) -> list:
+        '''
+        ELVR files within an upload: the .elvr member names of a .zip bundle, otherwise [None] for the upload itself.
+        Only the zip central directory is read.
+        '''
+        if not uploaded_file.name.lower().endswith(".zip"): return [None]
+        uploaded_file.seek(0)
+        with zipfile.ZipFile(uploaded_file) as bundle:
+            return [info.filename for info in bundle.infolist() if not info.is_dir() and info.filename.lower().endswith(".elvr")]
+
+    @contextlib.contextmanager
+    def open_elvr_stream(uploaded_file, member:str = None):
+        '''
+        Context manager yielding a binary stream of the ELVR text in an upload. .elvr.gz/.elvr.zst uploads and members of .zip bundles 
+        are decompressed chunk by chunk as the stream is read, never as a whole decompressed copy. 
+        The decompressing stream and the .zip bundle are closed on exit.
+        '''
+        if uploaded_file.seekable(): uploaded_file.seek(0)
+        if member is not None:
+            with zipfile.ZipFile(uploaded_file) as bundle, bundle.open(member) as stream:
+                yield stream
+            return
+        for extension, codec in dataframe_functions.compressed_formats.items():
+            if not uploaded_file.name.lower().endswith(extension): continue
+            # Read in-memory uploads through a zero-copy buffer, as a PythonFile closes the upload it wraps once released
+            source = pa.BufferReader(pa.py_buffer(uploaded_file.getbuffer())) if hasattr(uploaded_file, "getbuffer") else pa.PythonFile(uploaded_file, mode="r")
+            with pa.CompressedInputStream(source, codec) as stream:
+                yield stream
+            return
+        yield uploaded_file
+
+    # ---- 0.1.1 Parse ELVR File ----
+    def parse_elvr(uploaded_file, print_log = False, spill_dir:str = None, filename:str = None) -> list[dict]:
+        '''
+        Parse every table of an ELVR file into logs. With `spill_dir`, each table is written to an uncompressed 
+        Arrow IPC (feather) file as soon as it is read and the log keeps only its "path"; load_elvr_log memory-maps it back.
+        '''
+        # ---- Pasrse ELVR ----
+        logs = []
+        # ---- Fetch File ----
+        # uploaded_file is a binary file-like object (e.g. from Streamlit or a decompressing stream), streamed without decoding to text
+        if uploaded_file.seekable(): uploaded_file.seek(0)
+        filename = filename or getattr(uploaded_file, "name", "uploaded_file")
+        lift_count = None
+        time_start = datetime.now()
+        bytes_parsed = 0
+
+        # ---- Parse through each table ----
+        for log, rows in dataframe_functions._iter_elvr_tables(uploaded_file):
+            if print_log: print(f"Loading Dataframe: {log['category']} for Simulation ID: {log['simulation_id']}, Run: {log['run']}")
+            table = dataframe_functions._read_elvr_arrow(rows, log["category"])
+            # ---- Get Lift Count ----
+            if log["category"] == "SpatialPlot": lift_count = pc.count_distinct(table.column(0)).as_py()
+            entry = {"category": log["category"], "simulation_id": log["simulation_id"], "run": log["run"], "lift_count": lift_count, "fingerprint": log["fingerprint"]}
+            # ---- Spill Table to Disk or Keep in Memory ----
+            if spill_dir is not None:
+                spill_name = f"{os.path.splitext(os.path.basename(filename))[0]}_{log['simulation_id']}_{log['run']}_{log['category']}_{log['offset']}.arrow"
+                entry["path"] = os.path.join(spill_dir, spill_name)
+                feather.write_feather(table, entry["path"], compression="uncompressed")
+            else:
+                entry["dataframe"] = dataframe_functions._elvr_arrow_to_dataframe(table, log["category"])
+            logs.append(entry)
+            bytes_parsed = log["offset"] + log["length"]
+
+        processing_time = max((datetime.now() - time_start).total_seconds(), 1e-6)
+        print(f"Finished Parsing {filename} \nEntries Logged: {len(logs)} \nProcessing Time: {processing_time}s \nThroughput: {bytes_parsed / 1e6 / processing_time:.1f} MB/s")
 
         return logs
-  
+
+    # ---- 0.1.1.1 Read ELVR Table ----
+    def _read_elvr_table(rows:list, category:str, columns:list[str] = None) -> pd.DataFrame:
+        return dataframe_functions._elvr_arrow_to_dataframe(dataframe_functions._read_elvr_arrow(rows, category, columns), category)
+
+    def _elvr_arrow_to_dataframe(table:pa.Table, category:str) -> pd.DataFrame:
+        # split_blocks keeps numeric columns as zero-copy views when the table is memory-mapped
+        df_elvr = table.to_pandas(split_blocks=True)
+        if category not in dataframe_functions.field_mapping: df_elvr.columns = range(1, len(df_elvr.columns) + 1)
+        return df_elvr
+
+    def _read_elvr_arrow(rows:list, category:str, columns:list[str] = None) -> pa.Table:
+        '''
+        Read the raw byte rows of one ELVR table straight into a columnar Arrow table, dropping the category cell.
+        Mapped tables are read with their declared dtypes and narrowed to `columns`, 
+        which defaults to field_projection (or every field if the category has no projection).
+        '''
+        buffer = rows[0] if len(rows) == 1 else b"".join(rows)
+        field_types = dataframe_functions.field_mapping.get(category)
+        if field_types:
+            field_names = list(field_types)
+            columns = columns or dataframe_functions.field_projection.get(category, field_names)
+            include_columns = [f"f{field_names.index(col) + 1}" for col in columns]
+            column_types = {f"f{field_names.index(col) + 1}": pa.from_numpy_dtype(np.dtype(field_types[col])) for col in columns}
+        else:
+            include_columns = []
+            column_types = {}
+        table = pacsv.read_csv(
+            pa.BufferReader(pa.py_buffer(buffer)), 
+            read_options = pacsv.ReadOptions(autogenerate_column_names=True),
+            convert_options = pacsv.ConvertOptions(include_columns=include_columns, column_types=column_types),
+            )
+        # ---- Apply Field Mapping ----
+        if include_columns: return table.rename_columns(columns)
+        return table.drop_columns([table.column_names[0]])
+
+    # ---- 0.1.1.2 Index ELVR File ----
+    def index_elvr(uploaded_file) -> list[dict]:
+        '''
+        Pre-scan an ELVR file and record the byte offset of each (simulation_id, run, category) table without materializing it.
+        Only the lift_id column of SpatialPlot tables is read, to populate lift_count for the summary.
+        Entries carry the same metadata as parse_elvr logs and are loaded on demand via load_elvr_log.
+        '''
+        if hasattr(uploaded_file, "seek"): uploaded_file.seek(0)
+        filename = getattr(uploaded_file, "name", "uploaded_file")
+        logs = []
+        lift_count = None
+        time_start = datetime.now()
+        bytes_indexed = 0
+
+        # ---- Index each table ----
+        for log, rows in dataframe_functions._iter_elvr_tables(uploaded_file):
+            if log["category"] == "SpatialPlot": 
+                lift_count = dataframe_functions._read_elvr_table(rows, log["category"], columns=["lift_id"])["lift_id"].nunique()
+            log["lift_count"] = lift_count
+            logs.append(log)
+            bytes_indexed = log["offset"] + log["length"]
+
+        processing_time = max((datetime.now() - time_start).total_seconds(), 1e-6)
+        print(f"Finished Indexing {filename} \nEntries Indexed: {len(logs)} \nProcessing Time: {processing_time}s \nThroughput: {bytes_indexed / 1e6 / processing_time:.1f} MB/s")
+
+        return logs
+
+    # ---- 0.1.1.3 Load ELVR Log ----
+    def load_elvr_log(log:dict, uploaded_file = None) -> pd.DataFrame:
+        '''
+        Return the dataframe of a parsed, spilled or indexed log. Spilled logs are memory-mapped from their Arrow file, 
+        indexed logs are read by seeking to their byte offset in uploaded_file
+        '''
+        if "dataframe" in log: return log["dataframe"]
+        if "path" in log: return dataframe_functions._elvr_arrow_to_dataframe(feather.read_table(log["path"], memory_map=True), log["category"])
+        uploaded_file.seek(log["offset"])
+        return dataframe_functions._read_elvr_table([uploaded_file.read(log["length"])], log["category"])
+
+    # ---- 0.1.1.4 Read ELVR Upload ----
+    def read_elvr(uploaded_file, member:str = None, spill_dir:str = None) -> list[dict]:
+        '''
+        Index a plain ELVR upload, or with `spill_dir` stream it (decompressing compressed uploads and `member` of a .zip bundle) 
+        and spill its tables to disk. Offsets into a decompressed stream can't be seeked back to, so compressed uploads need `spill_dir`.
+        '''
+        if spill_dir is None: return dataframe_functions.index_elvr(uploaded_file)
+        with dataframe_functions.open_elvr_stream(uploaded_file, member) as stream:
+            return dataframe_functions.parse_elvr(stream, spill_dir=spill_dir, filename=member or uploaded_file.name)
+
+    def read_elvr_upload(name:str, data:bytes, member:str = None, spill_dir:str = None) -> list[dict]:
+        '''
+        Read an upload passed as raw bytes, so it can run in a worker process. 
+        The returned offsets are valid against the original upload.
+        '''
+        uploaded_file = io.BytesIO(data)
+        uploaded_file.name = name
+        return dataframe_functions.read_elvr(uploaded_file, member, spill_dir)
+
+    # ---- 0.1.1.5 Fingerprint ELVR Logs ----
+    def get_elvr_fingerprints(elvr_logs:list[dict]) -> dict:
+        '''
+        Combine the table fingerprints of parsed/indexed logs into content fingerprints for the whole file,
+        each simulation ID and each run. Only table bytes count, so blank lines or skipped categories don't change them.
+        The parser version is included, so content filed by an older version is ingested again.
+        '''
+        def combine(fingerprints:list[str]) -> str:
+            digest = hashlib.blake2b(dataframe_functions.parser_version.encode("ascii"), digest_size=16)
+            for fingerprint in fingerprints: digest.update(fingerprint.encode("ascii"))
+            return digest.hexdigest()
+
+        fingerprints = {"content_hash": combine([log["fingerprint"] for log in elvr_logs]), "simulations": {}}
+        for sim_id in dict.fromkeys(log["simulation_id"] for log in elvr_logs):
+            sim_logs = [log for log in elvr_logs if log["simulation_id"] == sim_id]
+            run_fingerprints = {run_id: combine([log["fingerprint"] for log in sim_logs if log["run"] == run_id]) for run_id in dict.fromkeys(log["run"] for log in sim_logs)}
+            fingerprints["simulations"][sim_id] = {"fingerprint": combine([log["fingerprint"] for log in sim_logs]), "runs": run_fingerprints}
+        return fingerprints
+
     # ---- 0.1.2 Summarise ELVR Logs ----
     def summarise_elvr_logs(elvr_logs: list[dict]) -> pd.DataFrame:
         # ---- Initialize Summary Dataframe ----
@@ -108,41 +375,33 @@ class dataframe_functions:
     #### 0.2 Parse ELVR Logs to Dictionary
     # ---- 0.2.1 Get Elevator Logbook Dataframe ----
     def parse_lift_elvr(df_lift_elvr:pd.DataFrame) -> dict[str, pd.DataFrame]:
-        # ---- Fetch Passenger Dataframe ----
-        df_lift = df_lift_elvr[["lift_id", "lobby_id", "time", "load", "area"]].copy()
-        df_lift_dict = {}
+        '''
+        Label each lift log with its status, for all lifts at once. Logs of each lift alternate arrival/departure in time order:
+        even positions are arrivals, odd positions depart up or down to the next log's lobby, or terminate on the last log.
+        '''
+        # ---- Fetch Lift Dataframe ----
+        df_lift = df_lift_elvr[["lift_id", "lobby_id", "time", "load", "area"]].dropna(subset=["lift_id"])
+        # ---- Sort by Lift then Time ----
+        df_lift = df_lift.sort_values(by=["lift_id", "time"], kind="stable").reset_index(drop=True)
+        lift_ids = df_lift["lift_id"].to_numpy()
+        lobby_ids = df_lift["lobby_id"].to_numpy()
+
+        # ---- Position of each Log within its Lift ----
+        is_first = np.ones(len(df_lift), dtype=bool)
+        is_first[1:] = lift_ids[1:] != lift_ids[:-1]
+        is_last = np.ones(len(df_lift), dtype=bool)
+        is_last[:-1] = is_first[1:]
+        group_starts = np.flatnonzero(is_first)
+        position = np.arange(len(df_lift)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(df_lift))))
+
         # ---- Log Lift Status ----
-        for lift_id, df_lift_split in df_lift.groupby("lift_id"):
-            # ---- Sort by Time and Reset Index ----
-            lift_logbook = df_lift_split.copy()
-            lift_logbook = lift_logbook.sort_values(by="time").reset_index(drop=True)
-
-            status_series = []
-            for log in lift_logbook.itertuples(index=True):
-                # ---- Initialize Variables ----
-                status = "unknown"
-                # ---- Even Index: Arrival ----
-                if log.Index % 2 == 0: 
-                    status = "arriving"                
-                # ---- Odd Index: Departure ----
-                else:
-                    if log.Index + 1 < len(lift_logbook):  # Check if further depature log exists
-                        cur_lobby_id = log.lobby_id
-                        next_lobby_id = lift_logbook.at[log.Index+1, "lobby_id"]
-                        if next_lobby_id > cur_lobby_id:
-                            status = "ascending"
-                        else:
-                            status = "descending"
-                    # ---- Last Index: Termination ----
-                    else: 
-                        status = "terminating"
-                status_series.append(status)
-            lift_logbook.insert(3, "status", status_series, allow_duplicates=False)
-
-            # ---- Add to Dictionary ----
-            df_lift_dict[lift_id] = lift_logbook
-
-        df_lift = pd.concat(list(df_lift_dict.values()), axis=0).reset_index(drop=True)
+        next_lobby_ids = np.empty_like(lobby_ids)
+        next_lobby_ids[:-1] = lobby_ids[1:]
+        status_codes = np.where(next_lobby_ids > lobby_ids, 1, 2)  # ascending / descending
+        status_codes[is_last] = 3  # terminating
+        status_codes[position % 2 == 0] = 0  # arriving
+        status = pd.Categorical.from_codes(status_codes, categories=["arriving", "ascending", "descending", "terminating"])
+        df_lift.insert(3, "status", status, allow_duplicates=False)
 
         return df_lift
     # ---- 0.2.2 Get Passenger Logbook Dataframe ----
@@ -157,26 +416,197 @@ class dataframe_functions:
         df_passenger['travel_time'] = df_passenger['wait_time'] + df_passenger['transit_time']
 
         return df_passenger
+
+    # ---- 0.2.3 Get Lift Trip Table ----
+    def get_lift_trips(lift_logbook:pd.DataFrame) -> pd.DataFrame:
+        '''
+        One row per lift trip from a parse_lift_elvr logbook: each ascending/descending departure paired with the arrival logged after it.
+        '''
+        is_departure = lift_logbook["status"].isin(["ascending", "descending"]).to_numpy()
+        departures = np.flatnonzero(is_departure)
+        arrivals = departures + 1  # departures are never the last log of a lift
+        df_trips = pd.DataFrame({
+            "trip_id": np.arange(len(departures), dtype=np.int32),
+            "lift_id": lift_logbook["lift_id"].to_numpy()[departures],
+            "depart_time": lift_logbook["time"].to_numpy()[departures],
+            "arrive_time": lift_logbook["time"].to_numpy()[arrivals],
+            "from_lobby": lift_logbook["lobby_id"].to_numpy()[departures],
+            "to_lobby": lift_logbook["lobby_id"].to_numpy()[arrivals],
+            "load": lift_logbook["load"].to_numpy()[departures],
+            "direction": pd.Categorical(lift_logbook["status"].to_numpy()[departures], categories=["ascending", "descending"]),
+            })
+        return df_trips
+
+    # ---- 0.2.4 Get Lift Occupancy Series ----
+    def get_lift_occupancy(lift_logbook:pd.DataFrame, interval:float = None) -> pd.DataFrame:
+        '''
+        Lift x time matrix of car load and area, one row per `interval` second bucket and a load_{lift_id}/area_{lift_id} column per lift.
+        Each log's load/area holds until the lift's next log, so buckets take the time-weighted mean of that step series.
+        '''
+        interval = interval or dataframe_functions.occupancy_interval
+        if lift_logbook.empty: return pd.DataFrame({"time": np.array([], dtype=np.float64)})
+        start_time = math.floor(lift_logbook["time"].min())
+        finish_time = math.ceil(lift_logbook["time"].max())
+        edges = start_time + interval * np.arange(math.ceil((finish_time - start_time) / interval) + 1)
+        occupancy = {"time": edges[:-1]}
+        load_columns, area_columns = {}, {}
+
+        # ---- Integrate Step Series at Bucket Edges ----
+        lift_ids = lift_logbook["lift_id"].to_numpy()
+        all_times = lift_logbook["time"].to_numpy()
+        field_values = {field: lift_logbook[field].to_numpy(dtype=np.float64) for field in ("load", "area")}
+        group_starts = np.flatnonzero(np.r_[True, lift_ids[1:] != lift_ids[:-1]])
+        group_ends = np.r_[group_starts[1:], len(lift_ids)]
+        for start, end in zip(group_starts, group_ends):
+            times = all_times[start:end]
+            edge_index = np.searchsorted(times, edges, side="right") - 1
+            before_first = edge_index < 0
+            edge_index[before_first] = 0
+            for field, columns in (("load", load_columns), ("area", area_columns)):
+                values = field_values[field][start:end]
+                cumulative = np.r_[0, np.cumsum(values[:-1] * np.diff(times))]
+                integral = cumulative[edge_index] + values[edge_index] * (edges - times[edge_index])
+                integral[before_first] = 0
+                columns[f"{field}_{lift_ids[start]}"] = (np.diff(integral) / interval).astype(np.float32)
+
+        occupancy.update(load_columns)
+        occupancy.update(area_columns)
+        return pd.DataFrame(occupancy)
+
+    # ---- 0.2.5 Join Passengers to Lift Trips ----
+    def join_passenger_trips(passenger_logbook:pd.DataFrame, lift_trips:pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        '''
+        Match each passenger to the trip they boarded (their lift's first departure from their lobby once their wait ends) 
+        and the trip they alighted from (that lift's first arrival at their destination from then on), with sorted as-of joins.
+        Passengers gain board_trip_id/alight_trip_id (-1 if unmatched) and trip_count; trips gain boarded/alighted/onboard counts.
+        '''
+        passenger_logbook = passenger_logbook.copy()
+        lift_trips = lift_trips.copy()
+        board_trip_ids = np.full(len(passenger_logbook), -1, dtype=np.int32)
+        alight_trip_ids = np.full(len(passenger_logbook), -1, dtype=np.int32)
+
+        # ---- Boarding: first departure of the lift from the passenger lobby after the wait ends ----
+        df_waiting = pd.DataFrame({
+            "row": np.arange(len(passenger_logbook)),
+            "lift_id": passenger_logbook["lift_id"].to_numpy(),
+            "lobby_id": passenger_logbook["lobby_id"].to_numpy(),
+            "time": passenger_logbook[["tbc_wait_time_end", "time_arrived"]].max(axis=1).to_numpy(dtype=np.float64),
+            }).sort_values("time", kind="stable")
+        df_departures = pd.DataFrame({
+            "trip_id": lift_trips["trip_id"].to_numpy(),
+            "lift_id": lift_trips["lift_id"].to_numpy(),
+            "lobby_id": lift_trips["from_lobby"].to_numpy(),
+            "time": lift_trips["depart_time"].to_numpy(dtype=np.float64),
+            }).sort_values("time", kind="stable")
+        df_boarded = pd.merge_asof(df_waiting, df_departures, on="time", by=["lift_id", "lobby_id"], direction="forward").dropna(subset=["trip_id"])
+        board_trip_ids[df_boarded["row"].to_numpy()] = df_boarded["trip_id"].to_numpy()
+
+        # ---- Alighting: first arrival of the boarded lift at the passenger destination from then on ----
+        boarded_rows = np.flatnonzero(board_trip_ids >= 0)
+        df_riding = pd.DataFrame({
+            "row": boarded_rows,
+            "lift_id": passenger_logbook["lift_id"].to_numpy()[boarded_rows],
+            "lobby_id": passenger_logbook["destination_id"].to_numpy()[boarded_rows],
+            "time": lift_trips["depart_time"].to_numpy(dtype=np.float64)[board_trip_ids[boarded_rows]],
+            }).sort_values("time", kind="stable")
+        df_arrivals = pd.DataFrame({
+            "trip_id": lift_trips["trip_id"].to_numpy(),
+            "lift_id": lift_trips["lift_id"].to_numpy(),
+            "lobby_id": lift_trips["to_lobby"].to_numpy(),
+            "time": lift_trips["arrive_time"].to_numpy(dtype=np.float64),
+            }).sort_values("time", kind="stable")
+        df_alighted = pd.merge_asof(df_riding, df_arrivals, on="time", by=["lift_id", "lobby_id"], direction="forward").dropna(subset=["trip_id"])
+        alight_trip_ids[df_alighted["row"].to_numpy()] = df_alighted["trip_id"].to_numpy()
+
+        # ---- Passenger Trip Columns ----
+        matched = alight_trip_ids >= 0
+        passenger_logbook["board_trip_id"] = board_trip_ids
+        passenger_logbook["alight_trip_id"] = alight_trip_ids
+        passenger_logbook["trip_count"] = np.where(matched, alight_trip_ids - board_trip_ids + 1, 0).astype(np.int16)
+
+        # ---- Passengers per Trip (trips of a lift are consecutive, so riders span board..alight) ----
+        trip_count = len(lift_trips)
+        lift_trips["boarded"] = np.bincount(board_trip_ids[board_trip_ids >= 0], minlength=trip_count).astype(np.int32)
+        lift_trips["alighted"] = np.bincount(alight_trip_ids[matched], minlength=trip_count).astype(np.int32)
+        riders = np.bincount(board_trip_ids[matched], minlength=trip_count + 1) - np.bincount(alight_trip_ids[matched] + 1, minlength=trip_count + 1)
+        lift_trips["onboard"] = np.cumsum(riders)[:trip_count].astype(np.int32)
+
+        return passenger_logbook, lift_trips
     
     
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
     #### 0.3 Parse ELVR Logs to Dictionary
+    # ---- 0.3.0 Interval Max ----
+    def get_interval_max(first_row:np.ndarray, last_row:np.ndarray, values:np.ndarray, row_count:int, empty_value = 0) -> np.ndarray:
+        '''
+        Max of `values` over the intervals covering each row, where interval i spans rows first_row[i]..last_row[i] (inclusive).
+        Rows no interval covers get `empty_value`. Each interval is written into the two power-of-two blocks that cover it
+        in a reverse sparse table, which is then pushed down level by level: O(P + T log T) instead of O(T x P).
+        '''
+        values = np.asarray(values)
+        sentinel = -np.inf if values.dtype.kind == "f" else np.iinfo(values.dtype).min
+        is_valid = (last_row >= first_row) & (first_row < row_count) & (last_row >= 0)
+        first_row = np.maximum(first_row[is_valid], 0)
+        last_row = np.minimum(last_row[is_valid], row_count - 1)
+        values = values[is_valid]
+        if len(values) == 0: return np.full(row_count, empty_value, dtype=values.dtype)
+
+        # ---- Write each Interval to its Level: two overlapping blocks of 2^level rows ----
+        levels = np.floor(np.log2(last_row - first_row + 1)).astype(np.int64)
+        top_level = int(levels.max())
+        table = [np.full(row_count, sentinel, dtype=values.dtype) for _ in range(top_level + 1)]
+        for level in range(top_level + 1):
+            at_level = levels == level
+            if not at_level.any(): continue
+            np.maximum.at(table[level], first_row[at_level], values[at_level])
+            np.maximum.at(table[level], last_row[at_level] - (1 << level) + 1, values[at_level])
+
+        # ---- Push Blocks down to single Rows ----
+        for level in range(top_level, 0, -1):
+            half = 1 << (level - 1)
+            np.maximum(table[level - 1], table[level], out=table[level - 1])
+            np.maximum(table[level - 1][half:], table[level][:row_count - half], out=table[level - 1][half:])
+        result = table[0]
+        result[result == sentinel] = empty_value
+        return result
+
     # ---- 0.3.1 Generate Timeline ----
-    def get_timeline_logbooks(passenger_logbook: pd.DataFrame) -> dict:
+    def get_timeline_logbooks(passenger_logbook: pd.DataFrame, time_range:tuple = None) -> dict:
+        '''
+        Per-lobby timeline of the passengers waiting at each second, swept from wait start/end events instead of a time x passenger mask.
+        Queue length and the sums behind the mean KPIs come from difference arrays and prefix sums in O(T + P) time and memory.
+        Registers are expanded as CSR rows (offsets + values, passengers in logbook order), so only waiting passengers are materialized.
+        With `time_range` (start, finish) only the rows in that block are built, from the passengers whose wait overlaps it.
+        '''
         timeline_logbooks = {}
 
         for lobby_id, df_passenger_split in passenger_logbook.groupby("lobby_id"):
             start_time = math.floor(df_passenger_split['time_arrived'].min())
             finish_time = math.ceil(df_passenger_split['tbc_time_disembarked'].max())
+            pas_wait_time_end = df_passenger_split[['tbc_wait_time_end', 'time_arrived']].max(axis=1).values
+
+            # ---- Clip to the Time Block, keeping Passengers waiting in it ----
+            if time_range is not None:
+                start_time, finish_time = max(start_time, time_range[0]), min(finish_time, time_range[1])
+                if start_time >= finish_time: continue
+                is_overlapping = (np.ceil(df_passenger_split['time_arrived'].values) < finish_time) & (np.floor(pas_wait_time_end) >= start_time)
+                df_passenger_split = df_passenger_split[is_overlapping]
+                pas_wait_time_end = pas_wait_time_end[is_overlapping]
             times = np.arange(start_time, finish_time)
+            time_count = len(times)
 
-            # Prepare intervals for each passenger (wait interval)
+            # ---- Wait Interval of each Passenger as a Span of Rows (t waiting if start <= t <= end) ----
             pas_wait_time_start = df_passenger_split['time_arrived'].values
-            pas_wait_time_end = df_passenger_split[['tbc_wait_time_end', 'time_arrived']].max(axis=1).values
+            first_row = np.clip(np.ceil(pas_wait_time_start) - start_time, 0, time_count).astype(np.int64)
+            last_row = np.clip(np.floor(pas_wait_time_end) - start_time, -1, time_count - 1).astype(np.int64)
+            span = np.maximum(last_row - first_row + 1, 0)
+            is_waiting = span > 0
 
-            # Build a 2D boolean mask: rows are times, columns are passengers
-            # mask[t, p] = True if passenger p is waiting at time t
-            mask = (times[:, None] >= pas_wait_time_start[None, :]) & (times[:, None] <= pas_wait_time_end[None, :])
+            # ---- Sweep Wait Start/End Events: Difference Array then Prefix Sum ----
+            def sweep(weights:np.ndarray = None) -> np.ndarray:
+                entering = np.bincount(first_row[is_waiting], weights=None if weights is None else weights[is_waiting], minlength=time_count + 1)
+                leaving = np.bincount(last_row[is_waiting] + 1, weights=None if weights is None else weights[is_waiting], minlength=time_count + 1)
+                return np.cumsum(entering - leaving)[:time_count]
 
             # Pre-fetch required columns as arrays for fast slicing
             passenger_ids = df_passenger_split['passenger_id'].values
@@ -184,74 +614,504 @@ class dataframe_functions:
             transit_times = df_passenger_split['transit_time'].values
             travel_times = df_passenger_split['travel_time'].values
 
-            # Alternative (and faster): build with list comprehensions
-            passenger_id_register_series = [passenger_ids[mask[i]].tolist() for i in range(len(times))]
-            wait_time_register_series = [wait_times[mask[i]].tolist() for i in range(len(times))]
-            transit_time_register_series = [transit_times[mask[i]].tolist() for i in range(len(times))]
-            travel_time_register_series = [travel_times[mask[i]].tolist() for i in range(len(times))]
-
-            # KPIs (vectorized)
-            queue_length_series = mask.sum(axis=1)
-            def safe_stat(arr, func, empty_val=0):
-                return func(arr) if len(arr) else empty_val
-            mean_wait_time_series = [np.mean(wait_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
-            max_wait_time_series = [np.max(wait_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
-            mean_transit_time_series = [np.mean(transit_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
-            max_transit_time_series = [np.max(transit_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
-            mean_travel_time_series = [np.mean(travel_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
-            max_travel_time_series = [np.max(travel_times[mask[i]]) if queue_length_series[i] else 0 for i in range(len(times))]
+            # ---- Expand Registers to CSR: Row Offsets and Passenger Index per Entry ----
+            queue_length_series = sweep()
+            offsets = np.concatenate(([0], np.cumsum(queue_length_series)))
+            entry_passenger = np.repeat(np.arange(len(span)), span)
+            entry_row = dataframe_functions._expand_ranges(first_row, span)
+            register_index = entry_passenger[np.argsort(entry_row, kind="stable")]
+
+            def register(values:np.ndarray) -> pd.arrays.ArrowExtensionArray:
+                return dataframe_functions.get_register_array(offsets, values[register_index])
+
+            # ---- KPIs: Means from Register Sums, Maxima from Interval Max ----
+            def mean_series(kpi:str) -> np.ndarray:
+                return summary_columns[f'sum_{kpi}'] / np.maximum(queue_length_series, 1)
+            def max_series(values:np.ndarray) -> np.ndarray:
+                return dataframe_functions.get_interval_max(first_row, last_row, values, time_count)
+
+            # ---- Mergeable Summaries: Passenger Count, Sums, Sums of Squares and Histograms of each Register ----
+            register_values = {"wait_time": wait_times[register_index], "transit_time": transit_times[register_index], "travel_time": travel_times[register_index]}
+            summary_columns = {'passenger_count': np.diff(offsets)}
+            for kpi, values in register_values.items():
+                summary_columns[f'sum_{kpi}'] = dataframe_functions.get_register_sums(offsets, values)
+                summary_columns[f'sumsq_{kpi}'] = dataframe_functions.get_register_sums(offsets, values.astype(np.float64) ** 2)
+            histogram_columns = {f'{kpi}_histogram': dataframe_functions.get_register_histogram(offsets, register_values[kpi], kpi) for kpi in dataframe_functions.timeline_histograms}
 
             # Build DataFrame
+            threshold_columns = dataframe_functions.get_threshold_columns(offsets, register_values["wait_time"])
+            percentile_columns = {**dataframe_functions.get_register_percentiles(offsets, register_values["wait_time"], "wait_time"),
+                                  **dataframe_functions.get_register_percentiles(offsets, register_values["travel_time"], "travel_time")}
             df_timeline = pd.DataFrame({
                 'time': times,
-                'passenger_register': passenger_id_register_series,
+                'passenger_register': register(passenger_ids),
                 'queue_length': queue_length_series,
-                'mean_wait_time': mean_wait_time_series,
-                'max_wait_time': max_wait_time_series,
-                'mean_transit_time': mean_transit_time_series,
-                'max_transit_time': max_transit_time_series,
-                'mean_travel_time': mean_travel_time_series,
-                'max_travel_time': max_travel_time_series,
-                'wait_time_register': wait_time_register_series,
-                'transit_time_register': transit_time_register_series,
-                'travel_time_register': travel_time_register_series,
+                'mean_wait_time': mean_series('wait_time'),
+                'max_wait_time': max_series(wait_times),
+                'mean_transit_time': mean_series('transit_time'),
+                'max_transit_time': max_series(transit_times),
+                'mean_travel_time': mean_series('travel_time'),
+                'max_travel_time': max_series(travel_times),
+                **percentile_columns,
+                **summary_columns,
+                'wait_time_register': register(wait_times),
+                'transit_time_register': register(transit_times),
+                'travel_time_register': register(travel_times),
+                **histogram_columns,
+                **threshold_columns,
             })
 
             timeline_logbooks[lobby_id] = df_timeline
 
         return timeline_logbooks
+    # ---- 0.3.1.1 Get Origin-Destination Matrices ----
+    def get_od_matrices(passenger_logbook:pd.DataFrame, interval:float = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        '''
+        Sparse lobby_id x destination_id matrices of passenger count and mean wait/transit time, only holding non-empty cells.
+        Returns the overall matrix and one stacked per `interval` second bucket of arrival time (bucket start in "time").
+        '''
+        interval = interval or dataframe_functions.od_interval
+        buckets = np.floor(passenger_logbook["time_arrived"].to_numpy(dtype=np.float64) / interval).astype(np.int64)
+        lobby_ids = passenger_logbook["lobby_id"].to_numpy().astype(np.int64)
+        destination_ids = passenger_logbook["destination_id"].to_numpy().astype(np.int64)
+        wait_times = passenger_logbook["wait_time"].to_numpy(dtype=np.float64)
+        transit_times = passenger_logbook["transit_time"].to_numpy(dtype=np.float64)
+
+        # ---- Sum Passengers per Cell ----
+        def aggregate(keys:np.ndarray) -> tuple[np.ndarray, pd.DataFrame]:
+            cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(cells))
+            df_od = pd.DataFrame({
+                "lobby_id": cells[:, -2].astype(np.int16),
+                "destination_id": cells[:, -1].astype(np.int16),
+                "count": counts.astype(np.int32),
+                "mean_wait_time": np.bincount(inverse, weights=wait_times, minlength=len(cells)) / counts,
+                "mean_transit_time": np.bincount(inverse, weights=transit_times, minlength=len(cells)) / counts,
+                })
+            return cells, df_od
+
+        _, od_matrix = aggregate(np.column_stack((lobby_ids, destination_ids)))
+        cells, od_timeline = aggregate(np.column_stack((buckets, lobby_ids, destination_ids)))
+        od_timeline.insert(0, "time", cells[:, 0] * interval)
+        return od_matrix, od_timeline
+
+    # ---- 0.3.1.2 Compile Origin-Destination Matrices ----
+    def compile_od_matrices(df_od_list:list[pd.DataFrame], run_counts:list[int] = None) -> pd.DataFrame:
+        '''
+        Compile OD matrices of multiple runs: count becomes the mean count per run, and mean times are weighted by count.
+        A matrix already compiled over n runs can be merged in with a run count of n.
+        '''
+        run_counts = run_counts or [1] * len(df_od_list)
+        df_od = pd.concat([df_od_split.assign(count = df_od_split["count"] * run_count) for df_od_split, run_count in zip(df_od_list, run_counts)], axis=0)
+        key_columns = [col for col in ["time", "lobby_id", "destination_id"] if col in df_od.columns]
+        df_od = df_od.assign(
+            wait_time_sum = df_od["mean_wait_time"] * df_od["count"], 
+            transit_time_sum = df_od["mean_transit_time"] * df_od["count"],
+            )
+        df_compiled = df_od.groupby(key_columns, as_index=False)[["count", "wait_time_sum", "transit_time_sum"]].sum()
+        df_compiled["mean_wait_time"] = df_compiled.pop("wait_time_sum") / df_compiled["count"]
+        df_compiled["mean_transit_time"] = df_compiled.pop("transit_time_sum") / df_compiled["count"]
+        df_compiled["count"] = df_compiled["count"] / sum(run_counts)
+        return df_compiled
+
     # ---- 0.3.2 Compile Timeline ----
-    def compile_timeline(df_timelines:list[pd.DataFrame]) -> pd.DataFrame:
+    def compile_timeline(df_timelines:list[pd.DataFrame], compiled:pd.DataFrame = None, member_count:int = None) -> pd.DataFrame:
         '''
-        Compile timeline logbooks across multiple lobbys and/or runs
+        Compile timeline logbooks across multiple lobbys and/or runs.
+        Timelines are aligned on a shared integer time index, so every KPI becomes a timelines x time matrix. Only per-row summaries are merged:
+        queue length and maxima are column maxima, passenger counts, sums and histograms add up, and means, percentiles and thresholds
+        are derived from the merged summaries. Raw registers are never read, so the cost doesn't depend on the passenger count.
+        Queue length and mean wait also get {kpi}_band_mean/min/max/p{q} columns across the timelines (run-to-run variability):
+        a timeline without a row at a time counts as a queue of 0 there, but is left out of the mean wait band.
+        A timeline compiled before can be passed as `compiled` to merge `df_timelines` into it, as if all were compiled at once.
+        `member_count` also counts members with no timeline at all (e.g. runs without traffic at a lobby) as queues of 0.
         '''
-        # ---- Aggregate Timeline Dataframes ----
-        df_compiled = pd.concat(df_timelines).groupby('time', as_index=False).agg(list)
-        # ---- Drop Fields ----
-        df_compiled.drop(columns=['passenger_register'], inplace=True) if 'passenger_register' in df_compiled.columns else None
+        # ---- Shared Time Index: Timeline x Time Position of every Row (an earlier compiled state is timeline 0) ----
+        if compiled is not None: df_timelines = [compiled] + list(df_timelines)
+        raw_registers = ['passenger_register', 'wait_time_register', 'transit_time_register', 'travel_time_register']
+        df_concat = pd.concat([df_timeline.drop(columns=raw_registers, errors='ignore') for df_timeline in df_timelines], ignore_index=True)
+        timeline_index = np.repeat(np.arange(len(df_timelines)), [len(df_timeline) for df_timeline in df_timelines])
+        time_values = df_concat['time'].to_numpy()
+        time_index = (time_values - time_values.min()).astype(np.int64) if len(time_values) else time_values.astype(np.int64)
+        row_of = np.full((len(df_timelines), time_index.max() + 1 if len(time_index) else 0), -1, dtype=np.int64)
+        row_of[timeline_index, time_index] = np.arange(len(df_concat))
+        row_of = row_of[:, (row_of >= 0).any(axis=0)]
+        is_present = row_of >= 0
+        # Rows ordered by time, then timeline
+        order = row_of.T[is_present.T]
+        group_offsets = np.r_[0, np.cumsum(is_present.sum(axis=0))]
 
-        # ---- Compile KPI Metrics ----
-        # ---- Insert Fields to Passenger Dataframe ----
-        df_compiled['queue_length_regiester'] = df_compiled['queue_length']
-        df_compiled['queue_length'] = df_compiled['queue_length'].apply(lambda x: max(x) if len(x)!= 0 else 0)
+        def to_matrix(values:np.ndarray, fill_value) -> np.ndarray:
+            matrix = np.full(row_of.shape, fill_value, dtype=np.result_type(values, np.asarray(fill_value)))
+            matrix[is_present] = values[row_of[is_present]]
+            return matrix
 
-        df_compiled['wait_time_register'] = df_compiled['wait_time_register'].apply(lambda list_of_lists: [item for sublist in list_of_lists for item in sublist])
-        df_compiled['transit_time_register'] = df_compiled['transit_time_register'].apply(lambda list_of_lists: [item for sublist in list_of_lists for item in sublist])
-        df_compiled['travel_time_register'] = df_compiled['travel_time_register'].apply(lambda list_of_lists: [item for sublist in list_of_lists for item in sublist])
+        def group_sum(column:str) -> np.ndarray:
+            return to_matrix(df_concat[column].to_numpy(), 0).sum(axis=0)
 
-        df_compiled['mean_wait_time_register'] = df_compiled['mean_wait_time']
-        df_compiled['mean_transit_time_register'] = df_compiled['mean_transit_time']
-        df_compiled['mean_travel_time_register'] = df_compiled['mean_travel_time']
-        
-        df_compiled['mean_wait_time'] = df_compiled['wait_time_register'].apply(lambda x: round(sum(x)/len(x), 1) if len(x)!= 0 else 0)
-        df_compiled['mean_transit_time'] = df_compiled['transit_time_register'].apply(lambda x: round(sum(x)/len(x), 1) if len(x)!= 0 else 0)
-        df_compiled['mean_travel_time'] = df_compiled['travel_time_register'].apply(lambda x: round(sum(x)/len(x), 1) if len(x)!= 0 else 0)
+        def group_histogram(column:str) -> pd.arrays.ArrowExtensionArray:
+            histograms = dataframe_functions.get_histogram_matrix(df_concat[column])
+            merged = np.zeros((row_of.shape[1], histograms.shape[1]), dtype=histograms.dtype)
+            for timeline_rows in row_of: merged[timeline_rows >= 0] += histograms[timeline_rows[timeline_rows >= 0]]
+            return dataframe_functions.get_histogram_array(merged)
+
+        def group_max(column:str) -> np.ndarray:
+            values = df_concat[column].to_numpy()
+            return to_matrix(values, -np.inf if values.dtype.kind == "f" else np.iinfo(values.dtype).min).max(axis=0, initial=None) if row_of.shape[1] else values[:0]
+
+        # ---- Members per Time: every timeline is one, a compiled state brings the members listed in its registers ----
+        def member_csr(column:str, register_column:str, fill_value = None) -> tuple[np.ndarray, np.ndarray]:
+            lengths = np.ones(len(df_concat), dtype=np.int64)
+            values = df_concat[column].to_numpy()
+            if compiled is not None:
+                state_offsets, state_values = dataframe_functions.get_register_csr(compiled[register_column])
+                lengths[:len(compiled)] = np.diff(state_offsets)
+                values = np.concatenate((state_values, values[len(compiled):]))
+            offsets = np.r_[0, np.cumsum(lengths)]
+            member_offsets = np.r_[0, np.cumsum(to_matrix(lengths, 0).sum(axis=0))]
+            member_values = values[dataframe_functions._expand_ranges(offsets[:-1][order], lengths[order])]
+            if fill_value is None: return member_offsets, member_values
+            # Members without a row at a time still count, holding `fill_value` (e.g. a run has no queue outside its own time span)
+            fill_count = len(df_timelines) if compiled is None else len(df_timelines) - 1 + lengths[:len(compiled)].max(initial=0)
+            fill_count = max(fill_count, member_count or 0)
+            present_counts = np.diff(member_offsets)
+            positions = np.repeat(np.arange(len(present_counts)) * fill_count - member_offsets[:-1], present_counts) + np.arange(len(member_values))
+            filled_values = np.full(len(present_counts) * fill_count, fill_value, dtype=np.result_type(member_values, fill_value))
+            filled_values[positions] = member_values
+            return np.arange(len(present_counts) + 1) * fill_count, filled_values
+
+        # ---- Columns derived after the Merge (placeholders keep the column order) ----
+        def is_mean(column:str) -> bool:
+            return column.startswith('mean_') and '_band_' not in column
+
+        def is_percentile(column:str) -> bool:
+            return column.startswith('p') and column[1:].split('_')[0].isdigit()
 
-        df_compiled['max_wait_time'] = df_compiled['max_wait_time'].apply(lambda x: max(x) if len(x)!= 0 else 0)
-        df_compiled['max_transit_time'] = df_compiled['max_transit_time'].apply(lambda x: max(x) if len(x)!= 0 else 0)
-        df_compiled['max_travel_time'] = df_compiled['max_travel_time'].apply(lambda x: max(x) if len(x)!= 0 else 0)
+        # ---- Merge Summaries: Counts, Sums and Histograms add up, Maxima take the Max. Raw Registers are not carried ----
+        df_compiled = {'time': time_values[order][group_offsets[:-1]]}
+        for column in df_concat.columns:
+            if column in ['queue_length'] or column.startswith('max_'): df_compiled[column] = group_max(column)
+            elif column == 'passenger_count' or column.startswith('sum_') or column.startswith('sumsq_'): df_compiled[column] = group_sum(column)
+            elif column.endswith('_histogram'): df_compiled[column] = group_histogram(column)
+            elif is_mean(column) or is_percentile(column) or column == 'queue_length_regiester': df_compiled[column] = None
+        members = {'queue_length': member_csr('queue_length', 'queue_length_regiester', fill_value=0)}
+        df_compiled['queue_length_regiester'] = dataframe_functions.get_register_array(*members['queue_length'])
+        for kpi in ['wait_time', 'transit_time', 'travel_time']:
+            members[f'mean_{kpi}'] = member_csr(f'mean_{kpi}', f'mean_{kpi}_register')
+            df_compiled[f'mean_{kpi}_register'] = dataframe_functions.get_register_array(*members[f'mean_{kpi}'])
+            means = df_compiled[f'sum_{kpi}'] / np.maximum(df_compiled['passenger_count'], 1)
+            # Python round() per row (not np.round) keeps correctly rounded halves, e.g. 109.55 -> 109.5
+            df_compiled[f'mean_{kpi}'] = np.where(df_compiled['passenger_count'] > 0, [round(mean, 1) for mean in means.tolist()], 0)
+        # ---- Bands of Queue Length and Mean Wait across the Members at each Time, reduced over the Member CSR ----
+        for kpi in ['queue_length', 'mean_wait_time']:
+            df_compiled.update(dataframe_functions.get_band_columns(*members[kpi], kpi))
+        for kpi in dataframe_functions.timeline_histograms:
+            df_compiled.update(dataframe_functions.get_histogram_percentiles(pd.Series(df_compiled[f'{kpi}_histogram']), kpi, df_compiled[f'max_{kpi}']))
+        df_compiled.update(dataframe_functions.get_histogram_thresholds(pd.Series(df_compiled['wait_time_histogram']), df_compiled['queue_length']))
+        df_compiled = {column: values for column, values in df_compiled.items() if values is not None}
+        df_compiled = pd.DataFrame(df_compiled)
 
         return df_compiled
+
+    # ---- 0.3.3 Timeline Registers ----
+    def _expand_ranges(starts:np.ndarray, lengths:np.ndarray) -> np.ndarray:
+        # Concatenation of arange(start, start + length) for every (start, length) pair
+        return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+    def get_register_array(offsets:np.ndarray, values:np.ndarray) -> pd.arrays.ArrowExtensionArray:
+        '''
+        Register column from CSR row offsets and flat values: one Arrow list array, with no per-row Python objects
+        '''
+        return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(pa.array(np.asarray(offsets), pa.int32()), pa.array(values)))
+
+    def get_register_csr(register:pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Row offsets and flat values of a register column, as numpy views of the Arrow buffers where possible.
+        Columns of Python lists (e.g. from older files) are converted.
+        '''
+        registers = pa.array(register.array) if isinstance(register.dtype, pd.ArrowDtype) else pa.array(register.tolist())
+        if isinstance(registers, pa.ChunkedArray): registers = registers.combine_chunks()
+        lengths = pc.list_value_length(registers).fill_null(0).to_numpy()
+        values = pc.list_flatten(registers).to_numpy(zero_copy_only=False)
+        return np.r_[0, np.cumsum(lengths)], values
+
+    def get_threshold_columns(offsets:np.ndarray, wait_times:np.ndarray, queue_length:np.ndarray = None, thresholds:list = None) -> dict:
+        '''
+        threshold_{t} columns from the wait time register (CSR): passengers per row who waited longer than t seconds.
+        Compiled timelines pass their queue length (max over lobbies/runs), which is then split by the share of the register above t.
+        '''
+        thresholds = thresholds or dataframe_functions.wait_thresholds
+        lengths = np.diff(offsets)
+        threshold_columns = {}
+        for threshold in thresholds:
+            above = np.r_[0, np.cumsum(wait_times > threshold)]
+            counts = above[offsets[1:]] - above[offsets[:-1]]
+            if queue_length is not None: counts = np.round(np.asarray(queue_length) * np.where(lengths > 0, counts / np.maximum(lengths, 1), 0), 1)
+            threshold_columns[f"threshold_{threshold}"] = counts
+        return threshold_columns
+
+    def get_register_percentiles(offsets:np.ndarray, values:np.ndarray, kpi:str, percentiles:list = None) -> dict:
+        '''
+        p{q}_{kpi} columns: per-row percentiles of a register (CSR), interpolated linearly as np.percentile does, 0 for empty rows.
+        All rows are sorted at once with one lexsort over (row, value), then each percentile is two gathers.
+        '''
+        percentiles = percentiles or dataframe_functions.timeline_percentiles
+        lengths = np.diff(offsets)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        sorted_values = np.asarray(values, dtype=np.float64)[np.lexsort((values, rows))]
+        has_values = lengths > 0
+        starts, last = offsets[:-1][has_values], lengths[has_values] - 1
+        percentile_columns = {}
+        for percentile in percentiles:
+            position = last * (percentile / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, last)
+            lower_values, upper_values = sorted_values[starts + lower], sorted_values[starts + upper]
+            column = np.zeros(len(lengths))
+            column[has_values] = lower_values + (upper_values - lower_values) * (position - lower)
+            percentile_columns[f"p{percentile}_{kpi}"] = column
+        return percentile_columns
+
+    def get_band_columns(offsets:np.ndarray, values:np.ndarray, kpi:str) -> dict:
+        '''
+        {kpi}_band_mean/min/max/p{q} columns from the members (CSR) at each time, e.g. the queue length of every run
+        '''
+        member_counts = np.diff(offsets)
+        values = np.asarray(values, dtype=np.float64)
+        band_columns = {f'{kpi}_band_mean': dataframe_functions.get_register_sums(offsets, values) / np.maximum(member_counts, 1),
+                        f'{kpi}_band_min': np.minimum.reduceat(values, offsets[:-1]) if len(values) else values,
+                        f'{kpi}_band_max': np.maximum.reduceat(values, offsets[:-1]) if len(values) else values}
+        band_percentiles = dataframe_functions.get_register_percentiles(offsets, values, kpi, dataframe_functions.timeline_band_percentiles)
+        for percentile in dataframe_functions.timeline_band_percentiles:
+            band_columns[f'{kpi}_band_p{percentile}'] = band_percentiles[f'p{percentile}_{kpi}']
+        return band_columns
+
+    # ---- 0.3.3.1 Wait Time Histograms ----
+    def get_register_sums(offsets:np.ndarray, values:np.ndarray) -> np.ndarray:
+        lengths = np.diff(offsets)
+        sums = np.zeros(len(lengths))
+        if (lengths > 0).any(): sums[lengths > 0] = np.add.reduceat(np.asarray(values, dtype=np.float64), offsets[:-1][lengths > 0])
+        return sums
+
+    def get_register_histogram(offsets:np.ndarray, values:np.ndarray, kpi:str) -> pd.arrays.ArrowExtensionArray:
+        '''
+        Fixed-bin histogram of a register (CSR) per row, as a fixed size list column of int32 counts binned as `timeline_histograms[kpi]`
+        '''
+        width, bins = dataframe_functions.timeline_histograms[kpi]
+        row_count = len(offsets) - 1
+        bin_index = np.clip(np.ceil(np.asarray(values, dtype=np.float64) / width), 0, bins - 1).astype(np.int64)
+        rows = np.repeat(np.arange(row_count), np.diff(offsets))
+        counts = np.bincount(rows * bins + bin_index, minlength=row_count * bins).astype(np.int32)
+        return dataframe_functions.get_histogram_array(counts.reshape(row_count, bins))
+
+    def get_histogram_array(matrix:np.ndarray) -> pd.arrays.ArrowExtensionArray:
+        return pd.arrays.ArrowExtensionArray(pa.FixedSizeListArray.from_arrays(pa.array(matrix.reshape(-1)), matrix.shape[1]))
+
+    def get_histogram_matrix(histogram:pd.Series) -> np.ndarray:
+        # rows x bins view of a histogram column
+        histograms = pa.array(histogram.array)
+        if isinstance(histograms, pa.ChunkedArray): histograms = histograms.combine_chunks()
+        return histograms.flatten().to_numpy(zero_copy_only=False).reshape(len(histograms), histograms.type.list_size)
+
+    def get_histogram_thresholds(histogram:pd.Series, queue_length:np.ndarray = None, thresholds:list = None) -> dict:
+        '''
+        threshold_{t} columns from the wait time histogram, as get_threshold_columns gives them from registers.
+        Exact for thresholds on a bin edge (multiples of the wait time bin width), otherwise counted from the next edge up.
+        '''
+        thresholds = thresholds or dataframe_functions.wait_thresholds
+        matrix = dataframe_functions.get_histogram_matrix(histogram)
+        above = np.cumsum(matrix[:, ::-1], axis=1)[:, ::-1]
+        lengths = matrix.sum(axis=1)
+        threshold_columns = {}
+        for threshold in thresholds:
+            first_bin = min(math.ceil(threshold / dataframe_functions.timeline_histograms["wait_time"][0]) + 1, matrix.shape[1] - 1)
+            counts = above[:, first_bin]
+            if queue_length is not None: counts = np.round(np.asarray(queue_length) * np.where(lengths > 0, counts / np.maximum(lengths, 1), 0), 1)
+            threshold_columns[f"threshold_{threshold}"] = counts
+        return threshold_columns
+
+    def get_histogram_percentiles(histogram:pd.Series, kpi:str, max_values:np.ndarray = None, percentiles:list = None) -> dict:
+        '''
+        p{q}_{kpi} columns estimated from a histogram column. The two order statistics np.percentile interpolates between are each placed
+        uniformly within their bin, with the row maximum (if given) closing the open last bin, so estimates stay within one bin width below it.
+        '''
+        percentiles = percentiles or dataframe_functions.timeline_percentiles
+        width = dataframe_functions.timeline_histograms[kpi][0]
+        matrix = dataframe_functions.get_histogram_matrix(histogram)
+        cumulative = np.cumsum(matrix, axis=1)
+        lengths = cumulative[:, -1]
+        rows = np.arange(len(matrix))
+        last_bin = matrix.shape[1] - 1
+        if max_values is not None: max_values = np.asarray(max_values, dtype=np.float64)
+
+        def order_statistic(position:np.ndarray) -> np.ndarray:
+            # Estimated value of the position-th (0-based) smallest entry of each row
+            bin_index = np.minimum((cumulative <= position[:, None]).sum(axis=1), last_bin)
+            bin_count = matrix[rows, bin_index]
+            within = (position - (cumulative[rows, bin_index] - bin_count) + 0.5) / np.maximum(bin_count, 1)
+            lower_edges = (bin_index - 1) * float(width)
+            bin_widths = np.full(len(matrix), float(width))
+            if max_values is not None: bin_widths[bin_index == last_bin] = np.maximum(max_values - lower_edges, 0)[bin_index == last_bin]
+            values = np.where(bin_index > 0, lower_edges + within * bin_widths, 0)
+            return values if max_values is None else np.minimum(values, max_values)
+
+        percentile_columns = {}
+        for percentile in percentiles:
+            rank = np.maximum(lengths - 1, 0) * (percentile / 100)
+            lower = np.floor(rank)
+            lower_values, upper_values = order_statistic(lower), order_statistic(np.minimum(lower + 1, np.maximum(lengths - 1, 0)))
+            percentile_columns[f"p{percentile}_{kpi}"] = np.where(lengths > 0, lower_values + (upper_values - lower_values) * (rank - lower), 0)
+        return percentile_columns
+
+    # ---- 0.3.4 Save and Load Timeline ----
+    def write_timeline(df_timeline:pd.DataFrame, path:str):
+        '''
+        Write a timeline to feather with `timeline_compression`, registers as Arrow list columns. Pandas metadata is left out:
+        it can't describe Arrow list dtypes, and without it any feather reader gets the registers as numpy arrays.
+        '''
+        table = pa.Table.from_pandas(df_timeline, preserve_index=False).replace_schema_metadata()
+        feather.write_feather(table, path, compression=dataframe_functions.timeline_compression)
+
+    def write_timeline_logbooks(passenger_logbook:pd.DataFrame, filing_dir:str, chunk_size:int = None) -> list:
+        '''
+        Generate and write the per-lobby timelines, their compiled all-lobby timeline and all levels `chunk_size` seconds at a time.
+        Each block is appended to the open feather files as one record batch, so peak memory follows the block, not the simulation length.
+        Returns the lobby ids in timeline order.
+        '''
+        chunk_size = chunk_size or dataframe_functions.timeline_chunk_size
+        first_block = math.floor(passenger_logbook['time_arrived'].min() / chunk_size) * chunk_size
+        finish_time = math.ceil(passenger_logbook['tbc_time_disembarked'].max())
+        writers = {}
+        lobby_ids = []
+
+        def write_batch(df_timeline:pd.DataFrame, path:str):
+            table = pa.Table.from_pandas(df_timeline, preserve_index=False).replace_schema_metadata()
+            if path not in writers:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writers[path] = pa.ipc.new_file(path, table.schema, options=pa.ipc.IpcWriteOptions(compression=dataframe_functions.timeline_compression))
+            writers[path].write_table(table)
+
+        def write_with_levels(df_timeline:pd.DataFrame, feather_name:str):
+            write_batch(df_timeline, os.path.join(filing_dir, feather_name))
+            for interval in dataframe_functions.timeline_levels:
+                write_batch(dataframe_functions.get_timeline_level(df_timeline, interval), os.path.join(filing_dir, "levels", str(interval), feather_name))
+
+        try:
+            for block_start in range(first_block, finish_time, chunk_size):
+                timeline_logbooks = dataframe_functions.get_timeline_logbooks(passenger_logbook, (block_start, block_start + chunk_size))
+                if not timeline_logbooks: continue
+                for lobby_id, df_timeline in timeline_logbooks.items():
+                    if lobby_id not in lobby_ids: lobby_ids.append(lobby_id)
+                    write_with_levels(df_timeline, f"timeline_logbook_{lobby_id}.feather")
+                write_with_levels(dataframe_functions.compile_timeline(list(timeline_logbooks.values())), "timeline_logbook.feather")
+        finally:
+            for writer in writers.values(): writer.close()
+        # Lobbies appear block by block, groupby order is sorted
+        return sorted(lobby_ids)
+
+    def get_timeline_columns(path:str) -> list[str]:
+        with pa.memory_map(path) as source: return pa.ipc.open_file(source).schema.names
+
+    def read_timeline(path:str, columns:list[str] = None) -> pd.DataFrame:
+        '''
+        Read a timeline memory-mapped, keeping registers as Arrow list columns whose buffers are viewed by numpy without per-row objects.
+        Uncompressed files are read zero-copy, compressed ones are decompressed once into Arrow buffers.
+        '''
+        table = feather.read_table(path, columns=columns, memory_map=True).replace_schema_metadata()
+        return table.to_pandas(split_blocks=True, types_mapper=lambda field_type: pd.ArrowDtype(field_type) if pa.types.is_list(field_type) or pa.types.is_fixed_size_list(field_type) else None)
+
+    # ---- 0.3.5 Timeline Levels ----
+    def get_timeline_level(df_timeline:pd.DataFrame, interval:int) -> pd.DataFrame:
+        '''
+        Aggregate a timeline into `interval` second rows: max for queue length, max, percentile and threshold columns, 
+        and means weighted by the passengers counted in each row. Registers, histograms and sums are left out.
+        Run bands keep their min and max, while their mean and percentiles are averaged over the rows unweighted.
+        '''
+        buckets = (df_timeline["time"].to_numpy() // interval) * interval
+        group_starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(buckets) else np.array([], dtype=np.int64)
+        # ---- Passengers behind each Mean: passenger count (or register length for older files), which is the queue length except in compiled timelines ----
+        if "passenger_count" in df_timeline.columns: weights = df_timeline["passenger_count"].to_numpy()
+        elif "wait_time_register" in df_timeline.columns: weights = np.diff(dataframe_functions.get_register_csr(df_timeline["wait_time_register"])[0])
+        else: weights = df_timeline["queue_length"].to_numpy()
+        weight_sums = np.add.reduceat(weights.astype(np.float64), group_starts) if len(group_starts) else np.array([])
+        row_counts = np.diff(np.r_[group_starts, len(buckets)])
+
+        df_level = {"time": buckets[group_starts]}
+        for column in df_timeline.columns:
+            if column == "time" or column.startswith("sum") or isinstance(df_timeline[column].dtype, pd.ArrowDtype) or df_timeline[column].dtype == object: continue
+            values = df_timeline[column].to_numpy()
+            if "_band_min" in column:
+                df_level[column] = np.minimum.reduceat(values, group_starts) if len(group_starts) else values[:0]
+            elif "_band_mean" in column or "_band_p" in column:
+                df_level[column] = np.add.reduceat(values.astype(np.float64), group_starts) / row_counts if len(group_starts) else values[:0]
+            elif column.startswith("mean_") and "_band_" not in column:
+                weighted_sums = np.add.reduceat(values * weights, group_starts) if len(group_starts) else np.array([])
+                df_level[column] = np.where(weight_sums > 0, weighted_sums / np.maximum(weight_sums, 1), 0)
+            else:
+                df_level[column] = np.maximum.reduceat(values, group_starts) if len(group_starts) else values[:0]
+        return pd.DataFrame(df_level)
+
+    def get_register_columns(df_timeline:pd.DataFrame) -> dict:
+        '''
+        Columns written at ingest, derived from the registers of a timeline ingested before them, so its levels (which carry no registers) 
+        still chart: wait thresholds and wait/travel percentiles, and for compiled timelines the run bands of queue length and mean wait.
+        Compiled timelines are told apart by their queue_length_regiester, and split their thresholds by queue length as at ingest.
+        '''
+        register_columns = {}
+        is_compiled = "queue_length_regiester" in df_timeline.columns
+        if "wait_time_register" in df_timeline.columns and any(f"threshold_{threshold}" not in df_timeline.columns for threshold in dataframe_functions.wait_thresholds):
+            queue_length = df_timeline["queue_length"].to_numpy() if is_compiled else None
+            register_columns.update(dataframe_functions.get_threshold_columns(*dataframe_functions.get_register_csr(df_timeline["wait_time_register"]), queue_length))
+        for kpi in ["wait_time", "travel_time"]:
+            if f"{kpi}_register" in df_timeline.columns and f"p{dataframe_functions.timeline_percentiles[0]}_{kpi}" not in df_timeline.columns:
+                register_columns.update(dataframe_functions.get_register_percentiles(*dataframe_functions.get_register_csr(df_timeline[f"{kpi}_register"]), kpi))
+        for kpi, register_column in [("queue_length", "queue_length_regiester"), ("mean_wait_time", "mean_wait_time_register")]:
+            if register_column not in df_timeline.columns or f"{kpi}_band_mean" in df_timeline.columns: continue
+            offsets, values = dataframe_functions.get_register_csr(df_timeline[register_column])
+            if kpi == "queue_length":
+                # Members without a row at a time count as a queue of 0, as in compile_timeline
+                lengths = np.diff(offsets)
+                member_count = lengths.max(initial=0)
+                filled_values = np.zeros(len(lengths) * member_count, dtype=values.dtype)
+                filled_values[np.repeat(np.arange(len(lengths)) * member_count - offsets[:-1], lengths) + np.arange(len(values))] = values
+                offsets, values = np.arange(len(lengths) + 1) * member_count, filled_values
+            register_columns.update(dataframe_functions.get_band_columns(offsets, values, kpi))
+        return register_columns
+
+    def write_timeline_levels(df_timeline:pd.DataFrame, filing_dir:str, feather_name:str):
+        # Levels are kept as levels/{interval}/{feather_name} under the folder of the 1s timeline
+        for interval in dataframe_functions.timeline_levels:
+            level_dir = os.path.join(filing_dir, "levels", str(interval))
+            os.makedirs(level_dir, exist_ok=True)
+            dataframe_functions.write_timeline(dataframe_functions.get_timeline_level(df_timeline, interval), os.path.join(level_dir, feather_name))
+
+    def select_timeline_level(time_span:float, max_points:int = None) -> int:
+        '''
+        Coarsest timeline level (seconds per row) that still gives `max_points` rows, e.g. the pixel width of a chart, over `time_span` seconds
+        '''
+        if not max_points: return 1
+        return max([1] + [interval for interval in dataframe_functions.timeline_levels if time_span / interval >= max_points])
+
+    def get_timeline_step(time:pd.Series) -> int:
+        # Seconds between the rows of a loaded timeline (its level), 1 for the 1s timeline
+        times = np.unique(time.to_numpy())
+        return max(1, int(round(np.diff(times).min()))) if len(times) > 1 else 1
+
+    def read_timeline_level(path:str, interval:int = 1, columns:list[str] = None) -> pd.DataFrame:
+        '''
+        Read the `interval` second level of the timeline at `path`, aggregating the 1s timeline if the level was never written 
+        (after deriving the columns its registers stood in for). Columns a level doesn't keep (registers) are skipped.
+        '''
+        if interval <= 1: return dataframe_functions.read_timeline(path, columns)
+        level_path = os.path.join(os.path.dirname(path), "levels", str(interval), os.path.basename(path))
+        if os.path.exists(level_path):
+            if columns is not None: columns = [col for col in columns if col in dataframe_functions.get_timeline_columns(level_path)]
+            return dataframe_functions.read_timeline(level_path, columns)
+        df_timeline = dataframe_functions.read_timeline(path)
+        register_columns = dataframe_functions.get_register_columns(df_timeline)
+        df_level = dataframe_functions.get_timeline_level(df_timeline.assign(**register_columns), interval)
+        # Derived columns are kept as they stand in for the registers
+        return df_level if columns is None else df_level[[col for col in df_level.columns if col in columns or col in register_columns]]
     
     
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -280,6 +1140,9 @@ class dataframe_functions:
         summary["max_wait_time"] = round(df_passenger_combined['wait_time'].max(),1)
         summary["max_transit_time"] = round(df_passenger_combined['transit_time'].max(),1)
         summary["max_travel_time"] = round(df_passenger_combined['travel_time'].max(),1)
+        # Passenger count and time sums keep the summary mergeable with merge_summary_kpi
+        summary["passenger_count"] = len(df_passenger_combined)
+        for kpi in ['wait_time', 'transit_time', 'travel_time']: summary[f"sum_{kpi}"] = float(df_passenger_combined[kpi].sum())
         
         # ---- Calculate Additional Metrics ----
         timespan = 0
@@ -290,6 +1153,23 @@ class dataframe_functions:
 
         return summary
 
+    # ---- Merge Summary Dictionaries ----
+    def merge_summary_kpi(summary_list:list[dict]) -> dict:
+        '''
+        Merge summaries of get_summary_kpi (e.g. one per run, or a scenario summary with new runs) without reloading their logbooks.
+        The peak is taken from the summary holding the longest queue (the earliest peak on ties, so the merge order doesn't matter), 
+        means are recomputed from passenger counts and sums.
+        '''
+        peak_summary = max(summary_list, key=lambda run_summary: (float(run_summary["queue_length"]), -float(run_summary["peak_time"])))
+        summary = {"peak_time": peak_summary["peak_time"], "queue_length": peak_summary["queue_length"]}
+        passenger_count = sum(run_summary["passenger_count"] for run_summary in summary_list)
+        sums = {kpi: float(sum(run_summary[f"sum_{kpi}"] for run_summary in summary_list)) for kpi in ['wait_time', 'transit_time', 'travel_time']}
+        for kpi in sums: summary[f"mean_{kpi}"] = round(np.float64(sums[kpi]) / passenger_count, 1)
+        for kpi in sums: summary[f"max_{kpi}"] = max(float(run_summary[f"max_{kpi}"]) for run_summary in summary_list)
+        summary["passenger_count"] = passenger_count
+        for kpi in sums: summary[f"sum_{kpi}"] = sums[kpi]
+        return summary
+
     
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
     #### 0.9 Master Function
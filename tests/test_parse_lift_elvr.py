@@ -0,0 +1,62 @@
+import glob
+import os
+import time
+
+import pandas as pd
+
+from elvr_pipeline_utilities import dataframe_functions as edff
+
+# Lift logbooks of every run of one real simulation, compiled by the ELVR pipeline
+lift_logbook_paths = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                   "resource", "data", "North Tower - Office - High Zone", "847", "*", "lift_logbook.feather")))
+
+def parse_lift_elvr_itertuples(df_lift_elvr:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Reference: the per-lift itertuples implementation parse_lift_elvr replaced
+    '''
+    df_lift = df_lift_elvr[["lift_id", "lobby_id", "time", "load", "area"]].copy()
+    df_lift_dict = {}
+    for lift_id, df_lift_split in df_lift.groupby("lift_id"):
+        lift_logbook = df_lift_split.sort_values(by="time").reset_index(drop=True)
+        status_series = []
+        for log in lift_logbook.itertuples(index=True):
+            if log.Index % 2 == 0: status = "arriving"
+            elif log.Index + 1 < len(lift_logbook): status = "ascending" if lift_logbook.at[log.Index+1, "lobby_id"] > log.lobby_id else "descending"
+            else: status = "terminating"
+            status_series.append(status)
+        lift_logbook.insert(3, "status", status_series, allow_duplicates=False)
+        df_lift_dict[lift_id] = lift_logbook
+    return pd.concat(list(df_lift_dict.values()), axis=0).reset_index(drop=True)
+
+def get_lift_elvr_block() -> pd.DataFrame:
+    '''
+    Rebuild a raw lift ELVR block from the stored logbooks: every run's lifts as distinct lift ids, logs of all lifts in time order
+    '''
+    df_lift_elvr = pd.concat([pd.read_feather(path).drop(columns="status").assign(lift_id=lambda df, run=run: df["lift_id"] + 100 * run)
+                              for run, path in enumerate(lift_logbook_paths)], ignore_index=True)
+    return df_lift_elvr.sort_values(by="time", kind="stable").reset_index(drop=True)
+
+def get_timing(function, df_lift_elvr:pd.DataFrame, repeats:int = 3) -> float:
+    timings = []
+    for _ in range(repeats):
+        time_start = time.perf_counter()
+        function(df_lift_elvr)
+        timings.append(time.perf_counter() - time_start)
+    return min(timings)
+
+def test_parse_lift_elvr_matches_itertuples():
+    '''
+    Compare with the itertuples version on a real block and report both timings (shown with pytest -s)
+    '''
+    df_lift_elvr = get_lift_elvr_block()
+    expected = parse_lift_elvr_itertuples(df_lift_elvr)
+    df_lift = edff.parse_lift_elvr(df_lift_elvr)
+
+    pd.testing.assert_frame_equal(df_lift.astype({"status": str}), expected)
+    # Status labels of the stored logbooks came from the itertuples version too
+    assert df_lift["status"].astype(str).tolist() == pd.concat([pd.read_feather(path)["status"] for path in lift_logbook_paths]).tolist()
+
+    itertuples_time = get_timing(parse_lift_elvr_itertuples, df_lift_elvr)
+    vectorized_time = get_timing(edff.parse_lift_elvr, df_lift_elvr)
+    print(f"\nparse_lift_elvr on {len(df_lift_elvr)} logs of {df_lift_elvr['lift_id'].nunique()} lifts: "
+          f"itertuples {itertuples_time * 1000:.1f} ms, vectorized {vectorized_time * 1000:.1f} ms ({itertuples_time / vectorized_time:.0f}x)")
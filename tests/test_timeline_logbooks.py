@@ -0,0 +1,50 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from elvr_pipeline_utilities import dataframe_functions as edff
+
+# Passenger logbook of one real run, compiled by the ELVR pipeline
+passenger_logbook_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      "resource", "data", "North Tower - Office - High Zone", "847", "1", "passenger_logbook.feather")
+
+# Means are summed per register row in passenger order (sequential), np.mean sums pairwise: allow summation-order noise only
+mean_rtol = 1e-15
+
+def get_timeline_logbooks_mask(passenger_logbook:pd.DataFrame) -> dict:
+    '''
+    Reference: the time x passenger mask implementation get_timeline_logbooks replaced
+    '''
+    timeline_logbooks = {}
+    for lobby_id, df in passenger_logbook.groupby('lobby_id'):
+        times = np.arange(math.floor(df['time_arrived'].min()), math.ceil(df['tbc_time_disembarked'].max()))
+        pas_wait_time_start = df['time_arrived'].values
+        pas_wait_time_end = df[['tbc_wait_time_end', 'time_arrived']].max(axis=1).values
+        mask = (times[:, None] >= pas_wait_time_start[None, :]) & (times[:, None] <= pas_wait_time_end[None, :])
+        df_timeline = pd.DataFrame({'time': times, 'queue_length': mask.sum(axis=1)})
+        for kpi in ['wait_time', 'transit_time', 'travel_time']:
+            values = df[kpi].values
+            df_timeline[f'mean_{kpi}'] = [np.mean(values[row]) if row.any() else 0 for row in mask]
+            df_timeline[f'max_{kpi}'] = [np.max(values[row]) if row.any() else 0 for row in mask]
+            df_timeline[f'{kpi}_register'] = [values[row].tolist() for row in mask]
+        df_timeline['passenger_register'] = [df['passenger_id'].values[row].tolist() for row in mask]
+        timeline_logbooks[lobby_id] = df_timeline
+    return timeline_logbooks
+
+def test_get_timeline_logbooks_matches_mask():
+    passenger_logbook = pd.read_feather(passenger_logbook_path)
+    expected_logbooks = get_timeline_logbooks_mask(passenger_logbook)
+    timeline_logbooks = edff.get_timeline_logbooks(passenger_logbook)
+    assert sorted(timeline_logbooks) == sorted(expected_logbooks)
+
+    for lobby_id, expected in expected_logbooks.items():
+        df_timeline = timeline_logbooks[lobby_id]
+        np.testing.assert_array_equal(df_timeline['time'].to_numpy(), expected['time'].to_numpy())
+        np.testing.assert_array_equal(df_timeline['queue_length'].to_numpy(), expected['queue_length'].to_numpy())
+        for kpi in ['wait_time', 'transit_time', 'travel_time']:
+            np.testing.assert_array_equal(df_timeline[f'max_{kpi}'].to_numpy(np.float64), expected[f'max_{kpi}'].to_numpy(np.float64))
+            np.testing.assert_allclose(df_timeline[f'mean_{kpi}'].to_numpy(np.float64), expected[f'mean_{kpi}'].to_numpy(np.float64), rtol=mean_rtol, atol=0)
+            assert [list(register) for register in df_timeline[f'{kpi}_register'].tolist()] == expected[f'{kpi}_register'].tolist()
+        assert [list(register) for register in df_timeline['passenger_register'].tolist()] == expected['passenger_register'].tolist()
@@ -1,7 +1,12 @@
 import os
 import json
 import math
+import shutil
+import hashlib
+import tempfile
 import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from io import StringIO
 import streamlit as st
@@ -10,9 +15,45 @@ from database_processor import database_processor as dbp
 
 class upload_processor:
 
+    # Uploads whose read results are kept across reruns, least recently used first out. 
+    # Indexed results hold byte offsets in memory, spilled results hold their tables on disk (deleted on eviction)
+    parse_cache_limit = 32
+
     @staticmethod
 
     # -----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
+    # ---- Ingested Fingerprints ----
+    def load_fingerprints(filing_dir:str) -> dict:
+        fingerprint_path = os.path.join(filing_dir, "fingerprint.txt")
+        if not os.path.exists(fingerprint_path): return {"content_hash": None, "simulations": {}}
+        with open(fingerprint_path, "r") as file: return json.loads(file.read())
+
+    # ---- Load Stored Run Logbooks ----
+    def load_run_logbooks(run_filing_dir:str) -> tuple:
+        '''
+        Read back the logbooks saved for an ingested run, in the shape generate_logs_and_save produces them
+        '''
+        lift_logbook = pd.read_feather(os.path.join(run_filing_dir, "lift_logbook.feather"))
+        passenger_logbook = pd.read_feather(os.path.join(run_filing_dir, "passenger_logbook.feather"))
+        od_matrix = pd.read_feather(os.path.join(run_filing_dir, "od_matrix.feather"))
+        od_timeline = pd.read_feather(os.path.join(run_filing_dir, "od_timeline.feather"))
+        timeline_all_lobbys = upload_processor.read_run_timeline(os.path.join(run_filing_dir, "timeline_logbook.feather"))
+        timeline_logbooks = {}
+        for feather_name in sorted(os.listdir(run_filing_dir)):
+            if feather_name.startswith("timeline_logbook_") and feather_name.endswith(".feather"):
+                lobby_id = feather_name.split("_")[-1].replace(".feather", "").strip()
+                timeline_logbooks[int(lobby_id)] = upload_processor.read_run_timeline(os.path.join(run_filing_dir, feather_name))
+        return lift_logbook, passenger_logbook, od_matrix, od_timeline, timeline_logbooks, timeline_all_lobbys
+
+    # ---- Read Run Timeline for Compiling ----
+    def read_run_timeline(path:str) -> pd.DataFrame:
+        '''
+        Read a run timeline without its registers, which hold most of its memory once decompressed.
+        Compiling runs and their summaries only use the per-row summaries, so every run's copy stays small until the scenario compile.
+        '''
+        columns = [column for column in edff.get_timeline_columns(path) if not column.endswith("_register") and not column.endswith("_regiester")]
+        return edff.read_timeline(path, columns)
+
     # ---- Process Raw Data ----
     #@st.dialog("Verify Uploads", width="large")
     def generate_logs_and_save(upload_collections:list[dict], database_dir:str, description:str = ""):
@@ -33,8 +74,19 @@ class upload_processor:
             # ---- Initialize Scenario Logs ----
             file_name = dict["name"]
             elvr_logs = dict["logs"]
+            uploaded_file = dict.get("file")
             filing_dir = os.path.join(database_dir, file_name)
 
+            # ---- Skip Files already Ingested with Identical Content ----
+            fingerprints = edff.get_elvr_fingerprints(elvr_logs)
+            ingested = upload_processor.load_fingerprints(filing_dir)
+            if ingested["content_hash"] == fingerprints["content_hash"]:
+                print(f"Skipping {file_name}: identical content already ingested.")
+                log_counter += len(elvr_logs)
+                scenario_counter += len(dict["summary"])
+                loading_bar.progress((log_counter/log_sum), text = f"Skipped {file_name}, already ingested")
+                continue
+
             # ---- Iterate through each Simulation ID ----
             unique_sim_ids = list({log["simulation_id"] for log in elvr_logs})
             
@@ -50,65 +102,124 @@ class upload_processor:
                 # ---- Skip if no logs for this simulation ID ----
                 if not matching_elvr_logs: continue 
 
+                # ---- Skip Scenarios already Ingested with Identical Content ----
+                ingested_scenario = ingested["simulations"].get(sim_id, {"fingerprint": None, "runs": {}})
+                if ingested_scenario["fingerprint"] == fingerprints["simulations"][sim_id]["fingerprint"] and os.path.exists(os.path.join(scenario_filing_dir, "summary.txt")):
+                    print(f"Skipping simulation {sim_id} of {file_name}: identical content already ingested.")
+                    log_counter += len(matching_elvr_logs)
+                    continue
+
                 # ---- Initialize Table Logs ----
                 lift_logbook_runlist = []
                 passenger_logbook_runlist = []
                 timeline_dict_runlist = []
                 timeline_all_lobbys_runlist = []
+                od_matrix_runlist = []
+                od_timeline_runlist = []
+                summary_runlist = []
+                processed_run_ids = []
+
+                # ---- Merge only New Runs into the Compiled Scenario unless an Uploaded Run changed a Compiled one ----
+                # Compiled runs missing from the upload are kept, so an upload of only the new runs extends the scenario
+                compiled_filing_dir = os.path.join(scenario_filing_dir, f"compiled")
+                compiled_summary = {}
+                if os.path.exists(os.path.join(scenario_filing_dir, "summary.txt")) and os.path.isdir(compiled_filing_dir):
+                    with open(os.path.join(scenario_filing_dir, "summary.txt"), "r") as file: compiled_summary = json.loads(file.read())
+                compiled_run_ids = compiled_summary.get("run_ids", [])
+                run_fingerprints = fingerprints["simulations"][sim_id]["runs"]
+                conflicting_run_ids = [run_id for run_id in compiled_run_ids if run_id in run_fingerprints and ingested_scenario["runs"].get(run_id) != run_fingerprints[run_id]]
+                incremental = bool(compiled_run_ids) and not conflicting_run_ids
+                scenario_name = compiled_summary.get("name") if incremental else None
 
-                # ---- Iterate through each Run ----
+                # ---- Iterate through each Run (uploaded ones and compiled ones missing from the upload) in Run Order ----
                 run_counter = 0
-                unique_run_ids = list({log["run"] for log in matching_elvr_logs})
+                uploaded_run_ids = {log["run"] for log in matching_elvr_logs}
+                unique_run_ids = sorted(uploaded_run_ids | set(compiled_run_ids), key=lambda run_id: (not run_id.isdigit(), int(run_id) if run_id.isdigit() else 0, run_id))
+                if incremental and all(run_id in compiled_run_ids for run_id in unique_run_ids):
+                    print(f"Skipping simulation {sim_id} of {file_name}: all runs already compiled.")
+                    log_counter += len(matching_elvr_logs)
+                    continue
+                # ---- Compiled Runs missing from the Upload are Recompiled from their Stored Logbooks, which must still be there ----
+                unavailable_run_ids = [run_id for run_id in compiled_run_ids if run_id not in uploaded_run_ids and not os.path.exists(os.path.join(scenario_filing_dir, run_id, "summary.txt"))]
+                if not incremental and unavailable_run_ids:
+                    raise FileNotFoundError(f"Simulation {sim_id} of {file_name}: compiled runs {unavailable_run_ids} have no stored logbooks and are missing from the upload. Upload them to recompile the scenario.")
 
                 for run_id in unique_run_ids:
-                    # ---- Collect Logs for current run ----
+                    # ---- Collect Logs for current run (none for a compiled run missing from the upload) ----
                     elvr_logs_per_run = [log for log in matching_elvr_logs if log["run"] == run_id]
-                    df_passenger_elvr = None
-                    df_lift_elvr = None
-                    for log in elvr_logs_per_run:
-                        if log["category"] == "Person":
-                            df_passenger_elvr = log["dataframe"]
-                        elif log["category"] == "SpatialPlot":
-                            df_lift_elvr = log["dataframe"]
-
-                    # ---- Skip if no passenger or lift logs for this run ----
-                    if df_passenger_elvr is None or df_lift_elvr is None:
-                        print(f"Skipping run {run_id} for simulation {sim_id} due to missing data.")
+                    run_filing_dir = os.path.join(scenario_filing_dir, f"{run_id}")
+
+                    # ---- Runs already in the Compiled Scenario are neither Loaded nor Compiled again ----
+                    if incremental and run_id in compiled_run_ids:
+                        log_counter += len(elvr_logs_per_run)
+                        run_counter += 1
                         continue
+                    run_unchanged = not elvr_logs_per_run or ingested_scenario["runs"].get(run_id) == run_fingerprints.get(run_id)
+                    run_ingested = run_unchanged and os.path.exists(os.path.join(run_filing_dir, "summary.txt"))
 
-                    # ---- Log Dataframes to Scenarios ----
-                    lift_logbook = edff.parse_lift_elvr(df_lift_elvr)
-                    passenger_logbook = edff.parse_passenger_elvr(df_passenger_elvr)
-                    timeline_logbooks = edff.get_timeline_logbooks(passenger_logbook)
-                    timeline_all_lobbys = edff.compile_timeline(list(timeline_logbooks.values()))
+                    # ---- Reuse Logbooks of Runs already Ingested with Identical Content ----
+                    if run_ingested:
+                        lift_logbook, passenger_logbook, od_matrix, od_timeline, timeline_logbooks, timeline_all_lobbys = upload_processor.load_run_logbooks(run_filing_dir)
+                    else:
+                        df_passenger_elvr = None
+                        df_lift_elvr = None
+                        for log in elvr_logs_per_run:
+                            if log["category"] == "Person":
+                                df_passenger_elvr = edff.load_elvr_log(log, uploaded_file)
+                            elif log["category"] == "SpatialPlot":
+                                df_lift_elvr = edff.load_elvr_log(log, uploaded_file)
 
-                    # ---- Save Dataframes ----
-                    run_filing_dir = os.path.join(scenario_filing_dir, f"{run_id}")
-                    os.makedirs(run_filing_dir, exist_ok=True)
-                    lift_logbook.to_feather(os.path.join(run_filing_dir, "lift_logbook.feather"))
-                    passenger_logbook.to_feather(os.path.join(run_filing_dir, "passenger_logbook.feather"))
-                    timeline_all_lobbys.to_feather(os.path.join(run_filing_dir, "timeline_logbook.feather"))
+                        # ---- Skip if no passenger or lift logs for this run ----
+                        if df_passenger_elvr is None or df_lift_elvr is None:
+                            print(f"Skipping run {run_id} for simulation {sim_id} due to missing data.")
+                            continue
+
+                        # ---- Log Dataframes to Scenarios ----
+                        lift_logbook = edff.parse_lift_elvr(df_lift_elvr)
+                        lift_trips = edff.get_lift_trips(lift_logbook)
+                        lift_occupancy = edff.get_lift_occupancy(lift_logbook)
+                        passenger_logbook = edff.parse_passenger_elvr(df_passenger_elvr)
+                        passenger_logbook, lift_trips = edff.join_passenger_trips(passenger_logbook, lift_trips)
+                        od_matrix, od_timeline = edff.get_od_matrices(passenger_logbook)
 
-                    for lobby_id, df_timeline in timeline_logbooks.items():
-                        df_timeline.to_feather(os.path.join(run_filing_dir, f"timeline_logbook_{lobby_id}.feather"))
+                        # ---- Save Dataframes ----
+                        os.makedirs(run_filing_dir, exist_ok=True)
+                        lift_logbook.to_feather(os.path.join(run_filing_dir, "lift_logbook.feather"))
+                        lift_trips.to_feather(os.path.join(run_filing_dir, "lift_trips.feather"))
+                        lift_occupancy.to_feather(os.path.join(run_filing_dir, "lift_occupancy.feather"))
+                        passenger_logbook.to_feather(os.path.join(run_filing_dir, "passenger_logbook.feather"))
+                        od_matrix.to_feather(os.path.join(run_filing_dir, "od_matrix.feather"))
+                        od_timeline.to_feather(os.path.join(run_filing_dir, "od_timeline.feather"))
+
+                        # ---- Timelines are Generated and Written in Time Blocks, then Memory-Mapped back ----
+                        lobby_ids = edff.write_timeline_logbooks(passenger_logbook, run_filing_dir)
+                        timeline_all_lobbys = upload_processor.read_run_timeline(os.path.join(run_filing_dir, "timeline_logbook.feather"))
+                        timeline_logbooks = {lobby_id: upload_processor.read_run_timeline(os.path.join(run_filing_dir, f"timeline_logbook_{lobby_id}.feather")) for lobby_id in lobby_ids}
 
                     # ---- Save Summary Data ----
                     lift_count = len(lift_logbook['lift_id'].unique()) if lift_logbook is not None and 'lift_id' in lift_logbook else 0
                     scenario_name = f"{file_name}: {lift_count} Lift"
 
-                    summary_dict = edff.get_summary_kpi([passenger_logbook], [timeline_all_lobbys])
-                    summary_dict["name"] = scenario_name
-                    summary_dict["simulation_id"] = sim_id
-                    summary_dict["run_id"] = run_id
-                    summary_dict["lift_count"] = lift_count
-                    
-                    summary_save_dir = os.path.join(run_filing_dir, "summary.txt")
-                    with open(summary_save_dir, "w") as file: file.write(json.dumps(summary_dict, default=str)) # use `json.loads` to do the reverse
+                    if not run_ingested:
+                        summary_dict = edff.get_summary_kpi([passenger_logbook], [timeline_all_lobbys])
+                        summary_dict["name"] = scenario_name
+                        summary_dict["simulation_id"] = sim_id
+                        summary_dict["run_id"] = run_id
+                        summary_dict["lift_count"] = lift_count
+                        
+                        summary_save_dir = os.path.join(run_filing_dir, "summary.txt")
+                        with open(summary_save_dir, "w") as file: file.write(json.dumps(summary_dict, default=str)) # use `json.loads` to do the reverse
+                    else:
+                        with open(os.path.join(run_filing_dir, "summary.txt"), "r") as file: summary_dict = json.loads(file.read())
 
                     lift_logbook_runlist.append(lift_logbook)
                     passenger_logbook_runlist.append(passenger_logbook)
                     timeline_dict_runlist.append(timeline_logbooks)
                     timeline_all_lobbys_runlist.append(timeline_all_lobbys)
+                    od_matrix_runlist.append(od_matrix)
+                    od_timeline_runlist.append(od_timeline)
+                    summary_runlist.append(summary_dict)
+                    processed_run_ids.append(run_id)
 
                     # ---- Update Status ----
                     log_counter += len(elvr_logs_per_run)
@@ -116,28 +227,51 @@ class upload_processor:
                     status = f"Processing Logs {log_counter}/{log_sum}... Scenario {scenario_counter}/{scenario_sum}, Run {run_counter}/{len(unique_run_ids)}" #Uploads ({log_counter/log_sum:.1%})...: 
                     loading_bar.progress((log_counter/log_sum), text = status)
                     
-                # ---- Compile Run Data and Save----
-                compiled_filing_dir = os.path.join(scenario_filing_dir, f"compiled")
+                # ---- Compile Run Data (merged into the Compiled State when Incremental). Every Table is Compiled before any is Written ----
+                # so a failure leaves the compiled scenario and its summary as they were, and a retry doesn't merge the new runs twice
                 os.makedirs(compiled_filing_dir, exist_ok=True)
-                compiled_timeline_all_lobbys_allrun = edff.compile_timeline(timeline_all_lobbys_runlist)
-                compiled_timeline_all_lobbys_allrun.to_feather(os.path.join(compiled_filing_dir, "timeline_logbook.feather"))
+                compiled_tables = {}
+                run_count = (len(compiled_run_ids) if incremental else 0) + len(timeline_dict_runlist)
+                compiled_timeline_all_lobbys = edff.read_timeline(os.path.join(compiled_filing_dir, "timeline_logbook.feather")) if incremental else None
+                compiled_tables["timeline_logbook.feather"] = edff.compile_timeline(timeline_all_lobbys_runlist, compiled=compiled_timeline_all_lobbys)
                 
-                # ---- Compiled Timeline by Lobby ----
-                #timeline_dict_runlist[0] is the first run. keys() are the lobby ids
-                unique_lobby_ids = timeline_dict_runlist[0].keys() if timeline_dict_runlist else []
-                for lobby_id in unique_lobby_ids:
-                    # get all the runs for each lobby
-                    timeline_perlobby_runlist = [timeline_dict[lobby_id] for timeline_dict in timeline_dict_runlist]
-                    compiled_timeline_perlobby_allrun = edff.compile_timeline(timeline_perlobby_runlist)
-                    compiled_timeline_perlobby_allrun.to_feather(os.path.join(compiled_filing_dir, f"timeline_logbook_{lobby_id}.feather"))
+                # ---- Compiled Timeline by Lobby: Lobbies of any New Run or of the Compiled State ----
+                unique_lobby_ids = {lobby_id for timeline_dict in timeline_dict_runlist for lobby_id in timeline_dict}
+                if incremental:
+                    unique_lobby_ids |= {int(feather_name.split("_")[-1].replace(".feather", "")) for feather_name in os.listdir(compiled_filing_dir) 
+                                         if feather_name.startswith("timeline_logbook_") and feather_name.endswith(".feather")}
+                for lobby_id in sorted(unique_lobby_ids):
+                    # runs (and compiled runs) without traffic at the lobby count as queues of 0 in its bands
+                    timeline_perlobby_runlist = [timeline_dict[lobby_id] for timeline_dict in timeline_dict_runlist if lobby_id in timeline_dict]
+                    compiled_perlobby_path = os.path.join(compiled_filing_dir, f"timeline_logbook_{lobby_id}.feather")
+                    compiled_timeline_perlobby = edff.read_timeline(compiled_perlobby_path) if incremental and os.path.exists(compiled_perlobby_path) else None
+                    compiled_tables[f"timeline_logbook_{lobby_id}.feather"] = edff.compile_timeline(timeline_perlobby_runlist, compiled=compiled_timeline_perlobby, member_count=run_count)
                 
-                # ---- Compile Summary ----
-                scenario_summary = edff.get_summary_kpi(passenger_logbook_runlist, timeline_all_lobbys_runlist)
+                # ---- Compiled Origin-Destination Matrices ----
+                od_run_counts = [1] * len(od_matrix_runlist)
+                if incremental and os.path.exists(os.path.join(compiled_filing_dir, "od_matrix.feather")):
+                    od_matrix_runlist.insert(0, pd.read_feather(os.path.join(compiled_filing_dir, "od_matrix.feather")))
+                    od_timeline_runlist.insert(0, pd.read_feather(os.path.join(compiled_filing_dir, "od_timeline.feather")))
+                    od_run_counts.insert(0, len(compiled_run_ids))
+                compiled_od = {}
+                if od_matrix_runlist:
+                    compiled_od["od_matrix.feather"] = edff.compile_od_matrices(od_matrix_runlist, od_run_counts)
+                    compiled_od["od_timeline.feather"] = edff.compile_od_matrices(od_timeline_runlist, od_run_counts)
+
+                # ---- Compile Summary from Run Summaries (and the Compiled Summary when Incremental) ----
+                scenario_summary = edff.merge_summary_kpi(([compiled_summary] if incremental else []) + summary_runlist)
                 scenario_summary["name"] = scenario_name    
                 scenario_summary["simulation_id"] = sim_id
                 scenario_summary["run_count"] = len(unique_run_ids)
-                scenario_summary["lift_count"] = len(lift_logbook_runlist[0]['lift_id'].unique())
-                scenario_summary["floor_count"] = passenger_logbook_runlist[0]["lobby_id"].nunique() if passenger_logbook_runlist else 0
+                scenario_summary["lift_count"] = len(lift_logbook_runlist[0]['lift_id'].unique()) if lift_logbook_runlist else compiled_summary.get("lift_count", 0)
+                scenario_summary["floor_count"] = len(unique_lobby_ids) if unique_lobby_ids else compiled_summary.get("floor_count", 0)
+                scenario_summary["run_ids"] = (compiled_run_ids if incremental else []) + processed_run_ids
+
+                # ---- Save Compiled Tables, then the Summary ----
+                for feather_name, compiled_timeline in compiled_tables.items():
+                    edff.write_timeline(compiled_timeline, os.path.join(compiled_filing_dir, feather_name))
+                    edff.write_timeline_levels(compiled_timeline, compiled_filing_dir, feather_name)
+                for feather_name, compiled_od_matrix in compiled_od.items(): compiled_od_matrix.to_feather(os.path.join(compiled_filing_dir, feather_name))
                 with open(os.path.join(scenario_filing_dir, "summary.txt"), "w") as file: 
                     file.write(json.dumps(scenario_summary, default=str))
             
@@ -152,12 +286,25 @@ class upload_processor:
             metadata_path = os.path.join(filing_dir, "metadata.txt")
             with open(metadata_path, "w") as file: file.write(json.dumps(metadata, default=str))
 
+            # ---- Save Fingerprints (runs ingested from earlier uploads keep theirs) ----
+            for sim_id, sim_fingerprints in fingerprints["simulations"].items():
+                ingested_scenario = ingested["simulations"].setdefault(sim_id, {"fingerprint": None, "runs": {}})
+                ingested_scenario["fingerprint"] = sim_fingerprints["fingerprint"]
+                ingested_scenario["runs"].update(sim_fingerprints["runs"])
+            ingested["content_hash"] = fingerprints["content_hash"]
+            with open(os.path.join(filing_dir, "fingerprint.txt"), "w") as file: file.write(json.dumps(ingested, default=str))
+
         # ---- Close Progress Bar ----
         loading_bar.empty()  # Clear the progress bar after processing is complete
     
     # ---- Verify Dataframes ----
     def verify_dataframes_and_submit(upload_collections:list[dict], base_dir:str, custom_description:str = ""):
         st.divider()
+        # ---- Surface Read Errors ----
+        for content in upload_collections:
+            if content["error"]: st.error(f"Could not read {content['name']}: {content['error']}", icon = ":material/error:")
+        upload_collections = [content for content in upload_collections if not content["error"]]
+        if not upload_collections: return
         file_name_display = st.empty()
         caption_display = st.empty()
         dataframe_display = st.empty()
@@ -186,11 +333,138 @@ class upload_processor:
         # ---- Managge Submission ----  
         if submitted:
             upload_processor.generate_logs_and_save(upload_collections, base_dir, custom_description)
+            # ---- Clear Spilled Tables ----
+            if "ELVR Spill Directory" in st.session_state:
+                parse_cache = st.session_state.get("ELVR Parse Cache", {})
+                for key in [key for key, entry in parse_cache.items() if entry.get("spill_dir") is not None]: upload_processor.evict_parse_cache_entry(parse_cache, key)
+                st.session_state.pop("ELVR Spill Directory").cleanup()
             # ---- Update Summary Table in Session State ----
             st.session_state["df_summary"] = dbp.get_summary(base_dir)
             # ---- Reset Uploader (Not Working Just Yet)----
             st.rerun() # Ensure the list is not empty
 
+    # ---- Upload Cache Key ----
+    def get_upload_key(uploaded_file) -> str:
+        '''
+        Cache key of an upload: content hash plus parser version. 
+        Hashes are memoised per Streamlit file_id, so reruns with the same uploads don't rehash their bytes.
+        '''
+        file_id = getattr(uploaded_file, "file_id", None)
+        upload_hashes = st.session_state.setdefault("ELVR Upload Hashes", {})
+        if file_id is None or file_id not in upload_hashes:
+            with uploaded_file.getbuffer() as buffer: content_hash = hashlib.sha256(buffer).hexdigest()
+            if file_id is None: return f"{edff.parser_version}:{content_hash}"
+            upload_hashes[file_id] = content_hash
+        return f"{edff.parser_version}:{upload_hashes[file_id]}"
+
+    # ---- Spill Directory of an Upload ----
+    def make_spill_dir() -> str:
+        '''
+        New folder for the spilled tables of one upload, under a session folder that is deleted with the session (or on exit)
+        '''
+        if "ELVR Spill Directory" not in st.session_state: st.session_state["ELVR Spill Directory"] = tempfile.TemporaryDirectory(prefix="elvr_spill_")
+        return tempfile.mkdtemp(dir=st.session_state["ELVR Spill Directory"].name)
+
+    def evict_parse_cache_entry(parse_cache:OrderedDict, key:str) -> None:
+        '''
+        Drop a cached read result and delete the folder of its spilled tables
+        '''
+        entry = parse_cache.pop(key)
+        if entry.get("spill_dir") is not None: shutil.rmtree(entry["spill_dir"], ignore_errors=True)
+
+    # ---- Read Uploads ----
+    def read_uploads(uploaded_file_list:list) -> list[dict]:
+        '''
+        Index uploads concurrently in a process pool bounded to the available cores, with at most one upload per worker in flight.
+        Every .elvr file in a .zip bundle is read as its own upload. Compressed uploads and other streams are decompressed 
+        as they are read and their tables spilled to disk, as they can't be seeked back into on Submit.
+        Results keep upload order; a file that fails to read carries its "error" instead of stopping the others.
+        Results of seekable uploads are cached in the session by content hash, so unchanged uploads are not read again on rerun.
+        '''
+        # ---- Expand .zip Bundles into their ELVR Files ----
+        upload_collections = []
+        upload_sources = []
+        for uploaded_file in uploaded_file_list:
+            try:
+                members = edff.list_elvr_members(uploaded_file)
+                error = None if members else "No .elvr files found in bundle"
+            except Exception as e:
+                members, error = [None], f"{type(e).__name__}: {e}"
+            for member in members or [None]:
+                upload_collections.append({"name": edff.get_elvr_name(member or uploaded_file.name), "file": uploaded_file, "logs": [], "summary": None, "error": error})
+                upload_sources.append((uploaded_file, member))
+        parse_cache = st.session_state.setdefault("ELVR Parse Cache", OrderedDict())
+        current_ids = {getattr(uploaded_file, "file_id", None) for uploaded_file in uploaded_file_list}
+        upload_hashes = st.session_state.setdefault("ELVR Upload Hashes", {})
+        for file_id in [file_id for file_id in upload_hashes if file_id not in current_ids]: del upload_hashes[file_id]
+        upload_keys = {i: upload_processor.get_upload_key(uploaded_file) + (f":{member}" if member else "") for i, (uploaded_file, member) in enumerate(upload_sources) if uploaded_file.seekable()}
+        # ---- Delete Spilled Tables of Removed Uploads, and of Uncached Streams read on the last Run ----
+        for key in [key for key, entry in parse_cache.items() if entry.get("spill_dir") is not None and key not in upload_keys.values()]: 
+            upload_processor.evict_parse_cache_entry(parse_cache, key)
+        for spill_dir in st.session_state.pop("ELVR Stream Spill Directories", []): shutil.rmtree(spill_dir, ignore_errors=True)
+        if not upload_collections: return upload_collections
+
+        # ---- Serve Cached Results ----
+        for i, key in upload_keys.items():
+            if key not in parse_cache: continue
+            parse_cache.move_to_end(key)
+            upload_collections[i]["logs"] = parse_cache[key]["logs"]
+            upload_collections[i]["summary"] = parse_cache[key]["summary"].copy()
+        uncached_indices = [i for i in range(len(upload_collections)) if upload_keys.get(i) not in parse_cache and upload_collections[i]["error"] is None]
+        if not uncached_indices: return upload_collections
+        loading_bar = st.progress(0, text = "Reading Uploads...")
+        completed = 0
+
+        # ---- Record Result and Update Status ----
+        def record(i:int, read):
+            nonlocal completed
+            content = upload_collections[i]
+            try:
+                content["logs"] = read()
+                content["summary"] = edff.summarise_elvr_logs(content["logs"])
+                # ---- Cache Result, Evicting Least Recently Used Results not in this Run ----
+                if i in upload_keys:
+                    parse_cache[upload_keys[i]] = {"logs": content["logs"], "summary": content["summary"].copy(), "spill_dir": spill_dirs.get(i)}
+                    evictable_keys = [key for key in parse_cache if key not in upload_keys.values()]
+                    while evictable_keys and len(parse_cache) > upload_processor.parse_cache_limit:
+                        upload_processor.evict_parse_cache_entry(parse_cache, evictable_keys.pop(0))
+                elif i in spill_dirs:
+                    st.session_state.setdefault("ELVR Stream Spill Directories", []).append(spill_dirs[i])
+            except Exception as e:
+                content["error"] = f"{type(e).__name__}: {e}"
+                if i in spill_dirs: shutil.rmtree(spill_dirs[i], ignore_errors=True)
+            completed += 1
+            loading_bar.progress(completed / len(uncached_indices), text = f"Read {content['name']} ({completed}/{len(uncached_indices)})")
+
+        # ---- Index Seekable Uploads, Spill Tables of Compressed Uploads and other Streams to Disk. Dataframes are loaded on Submit ----
+        # Every spilled upload gets its own folder, so uploads with the same .elvr name (e.g. in two zips) can't overwrite each other's tables
+        spill_dirs = {}
+        for i in uncached_indices:
+            uploaded_file, member = upload_sources[i]
+            if not uploaded_file.seekable() or edff.is_compressed_elvr(uploaded_file.name):
+                spill_dirs[i] = upload_processor.make_spill_dir()
+        seekable_indices = [i for i in uncached_indices if upload_sources[i][0].seekable()]
+        stream_indices = [i for i in uncached_indices if not upload_sources[i][0].seekable()]
+        core_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        worker_count = min(len(seekable_indices), core_count)
+        if worker_count > 1:
+            with ProcessPoolExecutor(max_workers = worker_count) as executor:
+                queued = list(seekable_indices)
+                running = {}
+                while queued or running:
+                    while queued and len(running) < worker_count:
+                        i = queued.pop(0)
+                        uploaded_file, member = upload_sources[i]
+                        running[executor.submit(edff.read_elvr_upload, uploaded_file.name, uploaded_file.getvalue(), member, spill_dirs.get(i))] = i
+                    done, _ = wait(running, return_when = FIRST_COMPLETED)
+                    for future in done: record(running.pop(future), future.result)
+        else:
+            for i in seekable_indices: record(i, lambda i = i: edff.read_elvr(*upload_sources[i], spill_dirs.get(i)))
+        for i in stream_indices: record(i, lambda i = i: edff.read_elvr(*upload_sources[i], spill_dirs[i]))
+
+        loading_bar.empty()
+        return upload_collections
+
     # ---- Upload Form ----
     def render_upload_form(base_dir:str):
         upload_form_description = """
@@ -205,24 +479,13 @@ class upload_processor:
         st.divider()
         form_upload_col1, form_upload_col2 = st.columns([3, 2], gap = "medium", vertical_alignment = "top", border = False)
         # ---- Uploader Widget -----
-        uploaded_file_list = form_upload_col1.file_uploader("Select Simulation Result File/s (.elvr)", type = [".elvr"], accept_multiple_files = True, label_visibility= "visible")
+        uploaded_file_list = form_upload_col1.file_uploader("Select Simulation Result File/s (.elvr, .elvr.gz, .elvr.zst, .zip)", type = [".elvr", ".elvr.gz", ".elvr.zst", ".zip"], accept_multiple_files = True, label_visibility= "visible")
         custom_name = form_upload_col2.text_area("Optional Metadata:", value = None, placeholder = "Optional Scenario Name", label_visibility = "hidden")
         custom_description = form_upload_col2.text_area("Description:", value = None, height = 100, max_chars = 1000, placeholder = "Optional Scenario Description", label_visibility = "collapsed")
 
         # ------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
         # ---- Process Uploads ----
-        upload_collections = []
-        elvr_name = ""
-        for uploaded_file in uploaded_file_list:
-            elvr_logs = edff.parse_elvr(uploaded_file)
-            elvr_logs_summary = edff.summarise_elvr_logs(elvr_logs)
-            elvr_name = os.path.splitext(uploaded_file.name)[0] # custom_name if custom_name is not None else os.path.splitext(uploaded_file.name)[0]
-            elvr_content = {
-                "name": elvr_name,
-                "logs": elvr_logs,
-                "summary": elvr_logs_summary
-            }
-            upload_collections.append(elvr_content)
+        upload_collections = upload_processor.read_uploads(uploaded_file_list)
 
         # ---- Verify Uploads ----
         if upload_collections: 